@@ -0,0 +1,223 @@
+"""
+    Asynchronous rendering, see Template.generate_async.
+
+    Async generators need python 3.6, so everything using them lives in
+    this module, which is only imported when rendering asynchronously.
+    The rest of ate keeps working on older versions.
+
+    agenerate(node, context) renders a node asynchronously. Nodes can
+    implement agenerate(context) themselves, the built in nodes are
+    handled by the functions registered with generates(), anything else
+    is rendered synchronously using its generate().
+"""
+import asyncio
+import inspect
+
+from .expression import Expression
+from .tags import Node, TextNode, ExpressionNode, BlockStatementNode
+from .tags import ForBlockStatementNode, IfBlockStatementNode
+from .tags import SlotStatementNode, CacheBlockStatementNode
+from .tags import IncludeStatementNode, Loop
+
+
+async def resolve(context, names=None):
+    """ await the awaitable values of names (by default all names)
+        concurrently and replace them by their results """
+    current = context.names
+    if names is None:
+        names = list(current)
+    pending = [name for name in names
+               if inspect.isawaitable(current.get(name))]
+    if pending:
+        values = await asyncio.gather(*[current[name] for name in pending])
+        current.update(zip(pending, values))
+
+
+async def aeval(context, expr, strict=False):
+    """ evaluate an Expression, awaiting the awaitables it refers to and
+        the result if that's awaitable """
+    if isinstance(expr, str):
+        expr = Expression(expr)
+
+    await context.resolve(expr.names)
+    value = context.eval(expr, strict)
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+async def generate_with_context(template, context, start_at_parent=True):
+    # always renders the node tree, generated code can't await
+    depth = len(context.children)
+    with context({}):
+        try:
+            tpl = template.enter(context, start_at_parent)
+            async for chunk in agenerate(tpl.mainnode, context):
+                yield chunk
+        finally:
+            del context.children[depth:]
+
+
+async def generate(template, context):
+    # the results are kept in a scope of their own, the data passed in is
+    # not changed
+    with context({}):
+        await context.resolve()
+        async for chunk in template.agenerate_with_context(context):
+            yield chunk
+
+
+async def render(template, context):
+    return "".join([chunk async for chunk in generate(template, context)])
+
+
+GENERATORS = {}
+
+
+def generates(klass):
+    """ register the decorated function to render klass (and its
+        subclasses) asynchronously """
+    def register(function):
+        GENERATORS[klass] = function
+        return function
+    return register
+
+
+def agenerate(node, context):
+    """ yield the rendered output of node in chunks, asynchronously """
+    method = getattr(node, "agenerate", None)
+    if method is not None:
+        return method(context)
+    for klass in node.__class__.__mro__:
+        function = GENERATORS.get(klass)
+        if function is not None:
+            return function(node, context)
+
+
+@generates(Node)
+async def generate_node(node, context):
+    for chunk in node.generate(context):
+        yield chunk
+
+
+@generates(TextNode)
+async def generate_text(node, context):
+    yield node.text
+
+
+@generates(ExpressionNode)
+async def generate_expression(node, context):
+    yield str(await context.aeval(node.compiled))
+
+
+@generates(BlockStatementNode)
+async def generate_block(node, context):
+    for child in node.nodes:
+        async for chunk in agenerate(child, context):
+            yield chunk
+
+
+async def looper(node, sequence):
+    """ node.looper() for async iterables (and plain iterables) """
+    if not hasattr(sequence, "__aiter__"):
+        for item in node.looper(sequence):
+            yield item
+        return
+
+    loop = Loop()
+    iterator = sequence.__aiter__()
+    try:
+        element = await iterator.__anext__()
+    except StopAsyncIteration:
+        return
+
+    i = 0
+    async for following in iterator:
+        loop.update(i, False)
+        yield loop, element
+        element = following
+        i += 1
+
+    loop.update(i, True)
+    yield loop, element
+
+
+@generates(ForBlockStatementNode)
+async def generate_for(node, context):
+    var = node.var
+    seq = await context.aeval(node.compiled)
+
+    scope = {var: None, 'loop': None}
+    context.push(scope)
+    names = context.names
+    async for loop, element in looper(node, seq):
+        names[var] = scope[var] = element
+        names['loop'] = scope['loop'] = loop
+        for child in node.nodes:
+            async for chunk in agenerate(child, context):
+                yield chunk
+    context.pop()
+
+
+async def select(node, context):
+    """ IfBlockStatementNode.select(), awaiting the conditions """
+    for condition, nodes in node.branches:
+        if await context.aeval(condition.compiled):
+            return nodes
+    return node.orelse or ()
+
+
+@generates(IfBlockStatementNode)
+async def generate_if(node, context):
+    for child in await select(node, context):
+        async for chunk in agenerate(child, context):
+            yield chunk
+
+
+@generates(SlotStatementNode)
+async def generate_slot(node, context):
+    children = context.children
+    if not children:
+        async for chunk in generate_block(node, context):
+            yield chunk
+        return
+
+    tpl = children.pop()
+    try:
+        selected = node.select(tpl)
+        if selected is tpl:
+            chunks = tpl.agenerate_with_context(context,
+                                                start_at_parent=False)
+        elif selected is not None:
+            chunks = agenerate(selected, context)
+        else:
+            chunks = generate_block(node, context)
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        children.append(tpl)
+
+
+@generates(CacheBlockStatementNode)
+async def generate_cache(node, context):
+    cache = context.fragment_cache
+    key = node.cache_key(await context.aeval(node.key, strict=True))
+    ttl = None if node.ttl is None else \
+        node.check_ttl(await context.aeval(node.ttl, strict=True))
+    value = cache.get(key)
+    if value is None:
+        value = "".join([chunk async for chunk
+                         in generate_block(node, context)])
+        cache.set(key, value, ttl)
+    yield value
+
+
+@generates(IncludeStatementNode)
+async def generate_include(node, context):
+    template = node.template(context)
+    children, context.children = context.children, []
+    try:
+        async for chunk in template.agenerate_with_context(context):
+            yield chunk
+    finally:
+        context.children = children
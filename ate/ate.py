@@ -27,9 +27,57 @@ TODO:
 import simpleeval
 from contextlib import contextmanager
 
+from .codegen import generate
+from .exceptions import evaluation_error
+from .expression import Expression
+from .fragmentcache import MemoryFragmentCache
+from .lexer import Lexer
+from .optimizer import optimize
 from .tags import MainNode
 
 
+MISSING = object()
+
+
+class Scopes:
+    """
+        The names visible through a stack of mappings that can't be merged
+        into a single dict, e.g. a defaultdict or a mapping that only
+        implements __getitem__. Every lookup walks the stack, innermost
+        scope first, assignments go to the innermost scope
+    """
+    __slots__ = ("stack",)
+
+    def __init__(self, stack):
+        self.stack = stack
+
+    def get(self, name, default=None):
+        for scope in reversed(self.stack):
+            try:
+                return scope[name]
+            except KeyError:
+                pass
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name, MISSING)
+        if value is MISSING:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self.stack[-1][name] = value
+
+    def update(self, items):
+        for name, value in dict(items).items():
+            self[name] = value
+
+    def __iter__(self):
+        """ the names of the scopes that can list them """
+        return iter({name for scope in self.stack if hasattr(scope, "keys")
+                     for name in scope.keys()})
+
+
 class Context:
     """
         Make it a context manager so context get popped automatically?
@@ -40,21 +88,36 @@ class Context:
     """
     evaluator_class = simpleeval.SimpleEval
     functions = {}
+    # where {% cache %} keeps its fragments, shared by all contexts
+    fragment_cache = MemoryFragmentCache()
+    # the Loader {% include %} loads templates from, set by the template
+    # being rendered
+    loader = None
 
     def __init__(self, data={}):
+        self.reset(data)
+        self.evaluator = self.evaluator_class(names=self.name_handler, functions=self.functions)
+
+    def reset(self, data={}):
+        """ start over with just data, the evaluator is kept """
         self.stack = [data]
+        self.shadowed = []
         self.children = []
-        self.evaluator = self.evaluator_class(names=self.name_handler, functions=self.functions)
+        # all names visible in the current scope. As long as all scopes
+        # are plain dicts they're merged into one dict when pushed (so
+        # changing a dict after pushing it has no effect, assign through
+        # names instead), for each push the shadowed values are kept to
+        # restore them. Other mappings are looked up through the stack
+        if data.__class__ is dict:
+            self.names = dict(data)
+        else:
+            self.names = Scopes(self.stack)
 
     def name_handler(self, node):
-        name = node.id
-        for ctx in reversed(self.stack):
-            try:
-                return ctx[name]
-            except KeyError:
-                pass
-
-        raise NameError(name)
+        value = self.names.get(node.id, MISSING)
+        if value is MISSING:
+            raise NameError(node.id)
+        return value
 
     def child(self):
         if self.children:
@@ -78,29 +141,99 @@ class Context:
 
     def push(self, data={}):
         self.stack.append(data)
+        names = self.names
+        if names.__class__ is not dict:
+            # the stack is walked already
+            self.shadowed.append(None)
+        elif data.__class__ is not dict:
+            # can't be merged, walk the stack until it's popped
+            self.names = Scopes(self.stack)
+            self.shadowed.append(names)
+        else:
+            self.shadowed.append([(name, names.get(name, MISSING))
+                                  for name in data])
+            names.update(data)
 
     def pop(self):
         self.stack.pop()
+        shadowed = self.shadowed.pop()
+        if shadowed is None:
+            return
+        if shadowed.__class__ is dict:
+            # the merged names from before the stack had to be walked
+            self.names = shadowed
+            return
+        names = self.names
+        for name, value in shadowed:
+            if value is MISSING:
+                del names[name]
+            else:
+                names[name] = value
+
+    def eval(self, expr, strict=False):
+        """ evaluate a compiled Expression, plain strings are parsed
+            on the fly. Missing attributes and type errors evaluate to
+            a ??..?? or !!..!! placeholder, unless strict is set """
+        if isinstance(expr, str):
+            expr = Expression(expr)
 
-    def eval(self, expr):
         try:
-            return self.evaluator.eval(expr.lstrip())
+            # the public eval() resets the evaluator's per expression
+            # state (e.g. EvalWithCompoundTypes' limits) and sets the
+            # source for its error messages
+            return self.evaluator.eval(expr.source.lstrip(),
+                                       previously_parsed=expr.tree)
         except simpleeval.AttributeDoesNotExist as e:
+            if strict:
+                raise evaluation_error(e, expr) from e
             return "??{}??".format(e.expression)
         except TypeError as e:
+            if strict:
+                raise evaluation_error(e, expr) from e
             return "!!{}!!".format(e)
+        except (simpleeval.InvalidExpression, NameError) as e:
+            # errors of the expression itself. Anything else, e.g. raised
+            # by a function it calls, is passed on as is
+            raise evaluation_error(e, expr) from e
+
+    def resolve(self, names=None):
+        """ await the awaitable values of names (by default all names)
+            concurrently and replace them by their results. Returns a
+            coroutine, see asyncrender """
+        from .asyncrender import resolve
+        return resolve(self, names)
+
+    def aeval(self, expr, strict=False):
+        """ evaluate an Expression, awaiting the awaitables it refers to
+            and the result if that's awaitable. Returns a coroutine """
+        from .asyncrender import aeval
+        return aeval(self, expr, strict)
+
+
+def default_evaluation(context_class):
+    """ does context_class evaluate expressions exactly like Context, so
+        literals can be evaluated once while compiling """
+    return context_class.evaluator_class is simpleeval.SimpleEval and \
+        context_class.eval is Context.eval and \
+        context_class.__init__ is Context.__init__
 
 
 def flatten(l):
     """ flatten recursive, nested lists of strings """
-    # StringIO might be more efficient?
-    b = ""
-    for i in l:
-        if isinstance(l, list):
-            b += flatten(i)
-        else:
-            b += i
-    return b
+    # collect all strings first and join them once, repeated string
+    # concatenation is quadratic
+    res = []
+    append = res.append
+
+    def collect(items):
+        for i in items:
+            if isinstance(i, list):
+                collect(i)
+            else:
+                append(i)
+
+    collect(l)
+    return "".join(res)
 
 
 class ParseContext:
@@ -108,72 +241,353 @@ class ParseContext:
         ParseContext is used to keep track of where we currently are in a
         template. Mostly for (more) detailed error reporting.
 
-        http://stackoverflow.com/questions/5722006/does-python-do-slice-by-reference-on-strings
+        It's a view on the source of the entire template, starting at
+        offset (and ending at end). Slicing it creates a new view, the
+        source itself is never copied.
     """
 
-    def __init__(self, code, offset=0, parent=None):
-        self.code = code
+    def __init__(self, source, offset=0, parent=None, end=None,
+                 trim_blocks=False, loader=None, name=None):
+        self.source = source
         self.offset = offset
+        self.end = len(source) if end is None else end
         self.parent = parent
+        self.root = self if parent is None else parent.root
         self.node = None
         self.tag = ""
+        self._lexer = None
+        # the blocks being compiled (innermost last) and how many of each
+        # class, only maintained on the root
+        self.blocks = []
+        self.open_classes = {}
+        # remove the first newline after a statement (see Lexer.text)
+        self.trim_blocks = trim_blocks
+        # includes are resolved through loader, name is the name of the
+        # template being compiled
+        self.loader = loader
+        self.name = name
+        # the names of all templates included, directly or not
+        self.includes = set()
+
+    @property
+    def code(self):
+        """ the source covered by this context. This creates a copy, the
+            parser itself only uses offsets into source """
+        return self.source[self.offset:self.end]
+
+    def lexer(self):
+        """ the Lexer for the entire template, created once and shared
+            by all contexts derived from it """
+        root = self.root
+        if root._lexer is None:
+            root._lexer = Lexer(root.source)
+        return root._lexer
+
+    def open_block(self, node):
+        root = self.root
+        if not root.blocks and node.parent is not None:
+            # parsing started inside an existing node, e.g. by calling
+            # CompileStatement directly. Its parents are open as well
+            parents = []
+            parent = node.parent
+            while parent is not None:
+                parents.append(parent)
+                parent = parent.parent
+            for parent in reversed(parents):
+                root.open_block(parent)
+
+        root.blocks.append(node)
+        klass = node.__class__
+        root.open_classes[klass] = root.open_classes.get(klass, 0) + 1
+
+    def close_block(self):
+        root = self.root
+        klass = root.blocks.pop().__class__
+        if root.open_classes[klass] == 1:
+            del root.open_classes[klass]
+        else:
+            root.open_classes[klass] -= 1
 
     def __len__(self):
-        return len(self.code) - self.offset
+        return self.end - self.offset
 
     def __getitem__(self, i):
         if isinstance(i, slice):
-            offset = i.start or 0
-            return ParseContext(self.code[i], offset=self.offset + offset,
-                                parent=self)
-        return self.code[i]
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError("ParseContext does not support steps")
+            return ParseContext(self.source, offset=self.offset + start,
+                                parent=self, end=self.offset + stop)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("ParseContext index out of range")
+        return self.source[self.offset + i]
 
     def position(self):
-        offset = self.offset
-        p = self
-        while True:
-            # offset += p.offset
-            code = p.code
-            if not p.parent:
-                break
-            p = p.parent
-
-        line = code[:offset].count('\n') + 1  # 1-based
-        col = len(code[:offset].rsplit("\n", 1)[-1]) + 1  # 1-based
-        return line, col
+        return self.lexer().lines.position(self.offset)
 
 
 class Template:
     context_class = Context
-
-    def __init__(self, code, parent=None, context_class=None):
+    # use the code generation backend (see codegen.py) to render
+    codegen = False
+    # simplify the compiled node tree (see optimizer.py)
+    optimize = True
+    # remove the line a statement is on if there's nothing else on it
+    trim_blocks = False
+
+    def __init__(self, code, parent=None, context_class=None, codegen=None,
+                 loader=None, name=None, compile_cache=None, optimize=None,
+                 trim_blocks=None):
         self.code = code
+        self.name = name
+        # e.g. a DiskCache, to avoid parsing the same source again
+        self.compile_cache = compile_cache
+        self.context_class = context_class or self.context_class
+        if optimize is not None:
+            self.optimize = optimize
+        if trim_blocks is not None:
+            self.trim_blocks = trim_blocks
+        # literals are only evaluated while compiling if the result is the
+        # same as while rendering, see for_context
+        self.folded = self.optimize and \
+            default_evaluation(self.context_class)
+        self.loader = loader
         self.mainnode = self.compile()
         self.rendered = []
+        # a Template, or the name of a template (or a tuple of names,
+        # nearest first) to be resolved through loader
         self.parent = parent
-        self.context_class = context_class or self.context_class
+        if codegen is not None:
+            self.codegen = codegen
+        self._chain = None
+        self._unfolded = None
+        self.generate_function = None
+        if self.codegen:
+            self.generate_function = generate(self.mainnode)
+
+    def __getstate__(self):
+        # generated code can't be pickled, it's generated again when
+        # the template is unpickled
+        state = self.__dict__.copy()
+        state["generate_function"] = None
+        state["_chain"] = None
+        state["_unfolded"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.codegen:
+            self.generate_function = generate(self.mainnode)
+
+    def compile_options(self):
+        """ the options that change the compiled node tree """
+        options = []
+        if self.trim_blocks:
+            options.append("trim_blocks")
+        if not self.optimize:
+            options.append("no_optimize")
+        if self.context_class is not Context:
+            klass = self.context_class
+            options.append("context_class={}.{}".format(
+                klass.__module__, klass.__qualname__))
+        return tuple(options)
 
     def compile(self):
+        cache = self.compile_cache
+        options = self.compile_options()
+        if cache is not None:
+            node = cache.load(self.code, options)
+            if node is not None:
+                return node
+
         node = MainNode(type="main")
-        node.compile(ParseContext(self.code))
+        node.compile(ParseContext(self.code, trim_blocks=self.trim_blocks,
+                                  loader=self.loader, name=self.name))
+        if self.optimize:
+            optimize(node, self.context_class, fold=self.folded)
+
+        if cache is not None:
+            cache.store(self.code, node, options)
         return node
 
+    def get_parent(self):
+        parent = self.parent
+        if isinstance(parent, str):
+            return self.loader.load(parent)
+        if isinstance(parent, tuple):
+            return self.loader.load(parent[0], parent=parent[1:] or None)
+        return parent
+
+    def chain(self):
+        """
+            The templates to render, from the topmost parent down to this
+            template. It's cached for as long as the parent's chain stays
+            the same (a parent given by name may be reloaded)
+        """
+        parent = self.get_parent()
+        parents = parent.chain() if parent is not None else None
+
+        cached = self._chain
+        if cached is not None and cached[0] is parents:
+            return cached[1]
+        chain = (parents or ()) + (self,)
+        self._chain = (parents, chain)
+        return chain
+
+    def for_context(self, context):
+        """
+            the template to render with context: self, or a copy of self
+            compiled without evaluating literals if those were evaluated
+            differently than context would
+        """
+        if not self.folded or context.__class__ is self.context_class or \
+           default_evaluation(context.__class__):
+            return self
+        if self._unfolded is None:
+            self._unfolded = Template(
+                self.code, parent=self.parent,
+                context_class=context.__class__, codegen=self.codegen,
+                loader=self.loader, name=self.name,
+                compile_cache=self.compile_cache, optimize=self.optimize,
+                trim_blocks=self.trim_blocks)
+        return self._unfolded
+
+    def generated(self, context):
+        """ the generated function to render with context, if any. The
+            generated code doesn't call context.eval(), a context
+            overriding it is rendered by the node tree """
+        if context.__class__.eval is not Context.eval:
+            return None
+        return self.generate_function
+
+    def enter(self, context, start_at_parent):
+        """ make the children available to the slots of the topmost
+            parent, return the template to render """
+        if self.loader is not None:
+            # includes are resolved through it
+            context.loader = self.loader
+        if not (self.parent and start_at_parent):
+            return self.for_context(context)
+        chain = self.chain()
+        # the nearest child is the last one
+        context.children.extend(tpl.for_context(context)
+                                for tpl in reversed(chain[1:]))
+        return chain[0].for_context(context)
+
     def render_with_context(self, context, start_at_parent=True):
+        depth = len(context.children)
         with context({}):
-            if self.parent and start_at_parent:
-                context.pushchild(self)
-                return self.parent.render_with_context(context)
-
-            return self.mainnode.render(context)
+            try:
+                tpl = self.enter(context, start_at_parent)
+                function = tpl.generated(context)
+                if function:
+                    return list(function(context))
+                return tpl.mainnode.render(context)
+            finally:
+                del context.children[depth:]
+
+    def generate_with_context(self, context, start_at_parent=True):
+        depth = len(context.children)
+        with context({}):
+            try:
+                tpl = self.enter(context, start_at_parent)
+                function = tpl.generated(context)
+                if function:
+                    yield from function(context)
+                else:
+                    yield from tpl.mainnode.generate(context)
+            finally:
+                del context.children[depth:]
+
+    def render_batch(self, items, context_class=None):
+        """
+            Render the template for each of items (dicts with the data to
+            render with), yielding the results in order.
+
+            A single Context (and its evaluator) is reused for all items,
+            and the static text of the template is collected once
+        """
+        context = (context_class or self.context_class)()
+        plans = {}
+
+        for data in items:
+            context.reset(data)
+            tpl = self.enter(context, True)
+            function = tpl.generated(context)
+            if function:
+                yield "".join(function(context))
+                continue
+
+            plan = plans.get(tpl)
+            if plan is None:
+                plan = plans[tpl] = tpl.mainnode.segments()
+            if len(plan) == 1 and isinstance(plan[0], str):
+                yield plan[0]
+                continue
+
+            res = []
+            for segment in plan:
+                if isinstance(segment, str):
+                    res.append(segment)
+                else:
+                    res.extend(segment.generate(context))
+            yield "".join(res)
+
+    def agenerate_with_context(self, context, start_at_parent=True):
+        from .asyncrender import generate_with_context
+        return generate_with_context(self, context, start_at_parent)
 
     def render_nested(self, *, context=None, context_class=None, **data):
         if not context:
             context = (context_class or self.context_class)(data)
         return self.render_with_context(context)
 
+    def generate(self, *, context=None, context_class=None, **data):
+        """ render the template, yielding the output in chunks as soon as
+            they're available """
+        if not context:
+            context = (context_class or self.context_class)(data)
+        return self.generate_with_context(context)
+
+    def render_to(self, writable, *, context=None, context_class=None,
+                  **data):
+        """ render the template, writing the output in chunks to writable
+            (anything with a write() method, e.g. a file) """
+        write = writable.write
+        for chunk in self.generate(context=context,
+                                   context_class=context_class, **data):
+            write(chunk)
+
+    def generate_async(self, *, context=None, context_class=None, **data):
+        """
+            render the template asynchronously, returning an async
+            generator yielding the output in chunks. Awaitable values in
+            the context are awaited (concurrently) before rendering
+            starts, awaitables produced while rendering (e.g. by calls,
+            attributes or loop elements) when the expression using them is
+            evaluated. for loops accept async iterables as well.
+
+            Needs python 3.6 or later, see asyncrender
+        """
+        from .asyncrender import generate
+        if not context:
+            context = (context_class or self.context_class)(data)
+        return generate(self, context)
+
+    def render_async(self, *, context=None, context_class=None, **data):
+        """ render the template asynchronously, returns a coroutine """
+        from .asyncrender import render
+        if not context:
+            context = (context_class or self.context_class)(data)
+        return render(self, context)
+
     def render(self, *, context=None, context_class=None, **data):
-        return flatten(self.render_nested(context=context,
-                                          context_class=context_class, **data))
+        # join the chunks once instead of building and flattening
+        # nested lists
+        return "".join(self.generate(context=context,
+                                     context_class=context_class, **data))
 
 
 if __name__ == '__main__':
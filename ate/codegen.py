@@ -0,0 +1,336 @@
+"""
+    Optional code generation backend.
+
+    Turns the node tree built by Template.compile into the source of a
+    single python function, which is then compiled with compile(). Text
+    becomes constants, {% for %} / {% if %} become native loops and
+    branches and expressions become plain python code.
+
+    Expressions are only translated if the translation is known to behave
+    like simpleeval (the operators and functions of the context's
+    evaluator are still used, names are still resolved by the evaluator's
+    name handler). Anything else, e.g. attributes simpleeval refuses to
+    access, is handed to the evaluator as is. Nodes the generator
+    doesn't know about (slots, custom tags) are rendered through the
+    interpreter, which remains the reference implementation.
+
+    The generated function evaluates expressions using context.evaluator
+    directly, so it does not call Context.eval: contexts overriding it are
+    rendered by the node tree instead (see Template.generated). Evaluators
+    overriding eval() (e.g. to reset per expression limits) get every
+    expression through their eval() instead.
+"""
+import ast
+
+import simpleeval
+
+from .exceptions import evaluation_error
+from .tags import TextNode, ExpressionNode, CommentNode
+from .tags import BlockStatementNode, MainNode, FillBlockStatementNode
+from .tags import ForBlockStatementNode, IfBlockStatementNode
+
+
+def name_resolver(evaluator):
+    """ return a callable resolving an ast.Name node the way the evaluator
+        would """
+    names = evaluator.names
+    if callable(names):
+        return names
+
+    def resolve(node):
+        try:
+            return names[node.id]
+        except KeyError:
+            raise simpleeval.NameNotDefined(node.id, evaluator.expr)
+    return resolve
+
+
+def attribute(value, attr, evaluator):
+    """ a.b means getattr(a, 'b') or, if that fails and the evaluator
+        allows it, a['b'] """
+    try:
+        return getattr(value, attr)
+    except (AttributeError, TypeError):
+        pass
+
+    if getattr(evaluator, "ATTR_INDEX_FALLBACK", True):
+        try:
+            return value[attr]
+        except (KeyError, TypeError):
+            pass
+
+    raise simpleeval.AttributeDoesNotExist(attr, evaluator.expr)
+
+
+def disallowed(attr):
+    """ attributes simpleeval refuses to access """
+    return attr.startswith(tuple(simpleeval.DISALLOW_PREFIXES)) or \
+        attr in getattr(simpleeval, "DISALLOW_METHODS", ())
+
+
+def function(functions, name, expr):
+    try:
+        return functions[name]
+    except KeyError:
+        raise simpleeval.FunctionNotDefined(name, expr)
+
+
+class CodeGenerator:
+    """
+        Generates the source for a generate(context) function from a node
+        tree. The function is a generator yielding the output chunks.
+    """
+    function_name = "generate"
+
+    def __init__(self):
+        self.lines = []
+        self.indent = 0
+        self.constants = {}
+        self.counter = 0
+        # operator class: the local holding the evaluator's function
+        self.operators = {}
+
+    def constant(self, value):
+        """ make value available to the generated code, return its name """
+        name = "_k{}".format(len(self.constants))
+        self.constants[name] = value
+        return name
+
+    def temp(self):
+        self.counter += 1
+        return "_t{}".format(self.counter)
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def generate(self, node):
+        """ return the python source and the globals it needs """
+        self.emit("def {}(context):".format(self.function_name))
+        self.indent += 1
+        self.emit("_ev = context.evaluator")
+        self.emit("_name = _name_resolver(_ev)")
+        self.emit("_ops = _ev.operators")
+        self.emit("_functions = _ev.functions")
+        self.emit("_own_eval = type(_ev).eval is not _SimpleEval.eval")
+        start = len(self.lines)
+        self.node(node)
+        # the operators used, None if the evaluator doesn't define them
+        self.lines[start:start] = [
+            "    {} = _ops.get({})".format(name, self.constant(op))
+            for op, name in self.operators.items()]
+        # make sure it's a generator, even if nothing is ever yielded
+        self.emit("return")
+        self.emit("yield")
+        self.indent -= 1
+
+        namespace = {
+            "_name_resolver": name_resolver,
+            "_attribute": attribute,
+            "_function": function,
+            "_SimpleEval": simpleeval.SimpleEval,
+            "_AttributeDoesNotExist": simpleeval.AttributeDoesNotExist,
+            "_InvalidExpression": simpleeval.InvalidExpression,
+            "_evaluation_error": evaluation_error,
+        }
+        namespace.update(self.constants)
+        return "\n".join(self.lines) + "\n", namespace
+
+    def node(self, node):
+        # exact class checks: subclasses may render differently
+        klass = node.__class__
+        if klass is TextNode:
+            self.emit("yield {!r}".format(node.text))
+        elif klass is CommentNode:
+            pass
+        elif klass is ExpressionNode:
+            value = self.evaluate(node.compiled)
+            self.emit("yield str({})".format(value))
+        elif klass in (MainNode, BlockStatementNode, FillBlockStatementNode):
+            self.nodes(node.nodes)
+        elif klass is ForBlockStatementNode:
+            self.for_block(node)
+        elif klass is IfBlockStatementNode:
+            self.if_block(node)
+        else:
+            self.emit("yield from {}.generate(context)".format(
+                self.constant(node)))
+
+    def nodes(self, nodes):
+        for node in nodes:
+            self.node(node)
+
+    def for_block(self, node):
+        seq = self.evaluate(node.compiled)
+        loop, element = self.temp(), self.temp()
+        scope, names = self.temp(), self.temp()
+        # the node's looper provides the loop variable
+        # a single scope for the loop, see ForBlockStatementNode
+        self.emit("{} = {{{!r}: None, 'loop': None}}".format(scope, node.var))
+        self.emit("context.push({})".format(scope))
+        self.emit("{} = context.names".format(names))
+        self.emit("for {}, {} in {}.looper({}):".format(
+            loop, element, self.constant(node), seq))
+        self.indent += 1
+        self.emit("{}[{!r}] = {}[{!r}] = {}".format(
+            names, node.var, scope, node.var, element))
+        self.emit("{}['loop'] = {}['loop'] = {}".format(names, scope, loop))
+        self.nodes(node.nodes)
+        self.indent -= 1
+        self.emit("context.pop()")
+
+    def if_block(self, node):
+        self.branches(node.branches, node.orelse)
+
+    def branches(self, branches, orelse):
+        """ emit an if/elif chain. Every condition has to be evaluated
+            separately, so elifs become nested else/if """
+        (condition, nodes), rest = branches[0], branches[1:]
+        self.emit("if {}:".format(self.evaluate(condition.compiled)))
+        self.block(nodes)
+        if rest:
+            self.emit("else:")
+            self.indent += 1
+            self.branches(rest, orelse)
+            self.indent -= 1
+        elif orelse:
+            self.emit("else:")
+            self.block(orelse)
+
+    def block(self, nodes):
+        """ emit an indented block of nodes """
+        self.indent += 1
+        start = len(self.lines)
+        self.nodes(nodes)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def evaluate(self, expression):
+        """
+            emit code evaluating a compiled Expression into a temporary,
+            handling errors the way Context.eval does. Returns the name
+            of the temporary
+        """
+        result = self.temp()
+        source = self.constant(expression.source.lstrip())
+        compiled = self.constant(expression)
+        self.emit("_ev.expr = {}".format(source))
+        self.emit("try:")
+        self.indent += 1
+        self.emit("{} = {} if not _own_eval else "
+                  "_ev.eval({}, previously_parsed={}.tree)".format(
+                      result,
+                      ExpressionCompiler(self, source).visit(expression.tree),
+                      source, compiled))
+        self.indent -= 1
+        self.emit("except _AttributeDoesNotExist as e:")
+        self.emit("    {} = '??{{}}??'.format(e.expression)".format(result))
+        self.emit("except TypeError as e:")
+        self.emit("    {} = '!!{{}}!!'.format(e)".format(result))
+        self.emit("except (_InvalidExpression, NameError) as e:")
+        self.emit("    raise _evaluation_error(e, {}) from e".format(
+            compiled))
+        return result
+
+
+class ExpressionCompiler:
+    """
+        Translates an expression tree into python source. Every construct
+        that can't be translated safely is evaluated by the evaluator
+    """
+
+    def __init__(self, generator, source):
+        self.generator = generator
+        self.source = source  # name of the constant holding the source
+
+    def visit(self, node):
+        method = getattr(self, "visit_" + node.__class__.__name__, None)
+        if method:
+            res = method(node)
+            if res is not None:
+                return res
+        return self.fallback(node)
+
+    def fallback(self, node):
+        return "_ev._eval({})".format(self.generator.constant(node))
+
+    def visit_Constant(self, node):
+        value = node.value
+        if isinstance(value, str) and \
+           len(value) > simpleeval.MAX_STRING_LENGTH:
+            return None
+        if value is None or isinstance(value, (bool, int, str)):
+            return repr(value)
+        return self.generator.constant(value)
+
+    def visit_Name(self, node):
+        if node.id == "None":
+            return "None"
+        return "_name({})".format(self.generator.constant(node))
+
+    def visit_Attribute(self, node):
+        if disallowed(node.attr):
+            return None
+        return "_attribute({}, {!r}, _ev)".format(
+            self.visit(node.value), node.attr)
+
+    def visit_Subscript(self, node):
+        index = node.slice
+        if isinstance(index, getattr(ast, "Index", ())):
+            index = index.value  # python < 3.9
+        if isinstance(index, ast.Slice):
+            parts = [self.visit(p) if p is not None else ""
+                     for p in (index.lower, index.upper, index.step)]
+            index = ":".join(parts)
+        elif isinstance(index, ast.expr) and \
+                not isinstance(index, ast.Tuple):
+            index = self.visit(index)
+        else:
+            return None
+        return "{}[{}]".format(self.visit(node.value), index)
+
+    def operator(self, node, op, *operands):
+        """ op applied to operands. If the evaluator doesn't define op
+            node is left to the evaluator, which raises its own error """
+        operators = self.generator.operators
+        name = operators.get(type(op))
+        if name is None:
+            name = operators[type(op)] = "_o{}".format(len(operators))
+        return "({}({}) if {} is not None else {})".format(
+            name, ", ".join(self.visit(o) for o in operands), name,
+            self.fallback(node))
+
+    def visit_BinOp(self, node):
+        return self.operator(node, node.op, node.left, node.right)
+
+    def visit_UnaryOp(self, node):
+        return self.operator(node, node.op, node.operand)
+
+    def visit_Compare(self, node):
+        if len(node.ops) != 1:
+            return None
+        return self.operator(node, node.ops[0], node.left,
+                             node.comparators[0])
+
+    def visit_IfExp(self, node):
+        return "({} if {} else {})".format(self.visit(node.body),
+                                           self.visit(node.test),
+                                           self.visit(node.orelse))
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords or \
+           any(isinstance(a, ast.Starred) for a in node.args):
+            return None
+        return "_function(_functions, {!r}, {})({})".format(
+            node.func.id, self.source,
+            ", ".join(self.visit(a) for a in node.args))
+
+
+def generate(node, filename="<template>"):
+    """ compile a node tree into a generate(context) function """
+    source, namespace = CodeGenerator().generate(node)
+    code = compile(source, filename, "exec")
+    exec(code, namespace)
+    func = namespace[CodeGenerator.function_name]
+    func.source = source
+    return func
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+from . import __version__
+
+
+class DiskCache:
+    """
+        Stores compiled templates (their node tree) in a directory so they
+        can be loaded on a later start without parsing them again.
+
+        Entries are keyed by a hash of the template source, the ate version
+        and the python implementation, so a change to either simply misses
+        the cache. Entries are pickles: only use a directory that is not
+        writable by untrusted users.
+    """
+    suffix = ".atec"
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, code, options=()):
+        """ options are the (str) compile options of the template """
+        h = hashlib.sha256()
+        h.update("{}\0{}\0".format(__version__,
+                                   sys.implementation.cache_tag).encode())
+        if options:
+            h.update("{}\0".format(",".join(options)).encode())
+        h.update(code.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    def filename(self, code, options=()):
+        return os.path.join(self.directory,
+                            self.key(code, options) + self.suffix)
+
+    def load(self, code, options=()):
+        """ return the node tree compiled from code, or None """
+        try:
+            with open(self.filename(code, options), "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # missing, corrupt or otherwise unusable entry
+            return None
+
+    def store(self, code, node, options=()):
+        # write to a temporary file first so concurrent readers never see
+        # a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(node, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.filename(code, options))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.unlink(os.path.join(self.directory, name))
@@ -6,6 +6,10 @@ class ExpressionNotClosed(ATEException):
     pass
 
 
+class TemplateNotFound(ATEException):
+    pass
+
+
 class ParseError(ATEException):
 
     def __init__(self, message, pc):
@@ -27,3 +31,70 @@ class StatementNotAllowed(ATEException):
 
 class UnexpectedClosingFound(ATEException):
     pass
+
+
+class EvaluationError(ATEException):
+    """ An expression could not be evaluated while rendering """
+    # the class of the error this one replaces, see error_class
+    wraps = None
+
+    def __init__(self, message, expression):
+        # not super(): subclasses also derive from the error they replace,
+        # whose __init__ may take other arguments
+        Exception.__init__(self, message)
+        self.expression = expression
+
+    def __reduce__(self):
+        # so it can be raised in another process, e.g. by render_many
+        if self.wraps is not None:
+            return restore_error, (self.wraps, self.args[0],
+                                   self.expression), self.__dict__
+        return self.__class__, (self.args[0], self.expression)
+
+
+class UndefinedNameError(EvaluationError, NameError):
+    """ An expression refers to a name that isn't defined. It's still a
+        NameError, which is what used to be raised """
+    wraps = NameError
+
+
+# the class of an error: the EvaluationError class raised instead
+error_classes = {NameError: UndefinedNameError}
+
+
+def error_class(klass):
+    """ the EvaluationError class raised instead of an error of klass. It
+        derives from klass as well, so code catching the original error
+        (e.g. simpleeval's InvalidExpression) still catches it """
+    res = error_classes.get(klass)
+    if res is None:
+        res = error_classes[klass] = type(
+            klass.__name__, (EvaluationError, klass),
+            {"__module__": __name__, "__doc__": klass.__doc__,
+             "wraps": klass})
+    return res
+
+
+def restore_error(klass, message, expression):
+    return error_class(klass)(message, expression)
+
+
+def evaluation_error(error, expression):
+    """ the EvaluationError to raise for error, raised by the evaluator
+        while evaluating expression. It keeps the attributes of error
+        (except its expression, which is the Expression here) """
+    res = error_class(error.__class__)(
+        evaluation_error_message(error, expression), expression)
+    res.__dict__.update((name, value) for name, value
+                        in error.__dict__.items() if name != "expression")
+    return res
+
+
+def evaluation_error_message(error, expression):
+    """ describe error, raised while evaluating expression """
+    message = "{}: {} in '{}'".format(error.__class__.__name__, error,
+                                      expression.source.strip())
+    position = expression.position()
+    if position:
+        message += " at line {}, column {}".format(*position)
+    return message
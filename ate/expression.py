@@ -0,0 +1,33 @@
+import ast
+
+
+class Expression:
+    """
+        An expression as it appears in a template, e.g. the "i + 1" in
+        {{ i + 1 }}. It's parsed once when the template is compiled so
+        rendering only has to walk the (already validated) tree.
+
+        Raises SyntaxError if the source is not a single python expression
+
+        offset is the position of the tag containing the expression in the
+        template, lines the LineIndex of the template. names are the
+        names the expression refers to.
+    """
+    __slots__ = ("source", "tree", "offset", "lines", "names")
+
+    def __init__(self, source, offset=None, lines=None):
+        self.source = source
+        self.tree = ast.parse(source.strip(), mode="eval").body
+        self.names = tuple(sorted({node.id for node in ast.walk(self.tree)
+                                   if isinstance(node, ast.Name)}))
+        self.offset = offset
+        self.lines = lines
+
+    def position(self):
+        """ 1-based (line, column) of the expression's tag, if known """
+        if self.lines is None:
+            return None
+        return self.lines.position(self.offset)
+
+    def __str__(self):
+        return self.source
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """
+        Stores the output of {% cache %} blocks by key. Counts hits and
+        misses, get() returns None for a missing or expired fragment.
+
+        ttl is the number of seconds a fragment may be used, None to keep
+        it for as long as possible
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.load(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        if ttl is not None and ttl <= 0:
+            return
+        self.store(key, value, ttl)
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def store(self, key, value, ttl):
+        raise NotImplementedError
+
+
+class MemoryFragmentCache(FragmentCache):
+    """ keeps at most size fragments in memory, the least recently used
+        ones are removed first """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, size=1024):
+        super().__init__()
+        self.size = size
+        self.fragments = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        with self.lock:
+            entry = self.fragments.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= self.clock():
+                del self.fragments[key]
+                return None
+            self.fragments.move_to_end(key)
+            return value
+
+    def store(self, key, value, ttl):
+        expires = None if ttl is None else self.clock() + ttl
+        with self.lock:
+            self.fragments[key] = (expires, value)
+            self.fragments.move_to_end(key)
+            while len(self.fragments) > self.size:
+                self.fragments.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.fragments.clear()
+
+
+class DiskFragmentCache(FragmentCache):
+    """ keeps fragments as files in directory, so they can be shared by
+        processes and survive restarts """
+    suffix = ".frag"
+    encoding = "utf-8"
+    clock = staticmethod(time.time)
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, key):
+        h = hashlib.sha256(str(key).encode("utf-8", "surrogatepass"))
+        return os.path.join(self.directory, h.hexdigest() + self.suffix)
+
+    def load(self, key):
+        filename = self.filename(key)
+        try:
+            with open(filename, encoding=self.encoding, newline="") as f:
+                expires = f.readline()
+                value = f.read()
+        except OSError:
+            return None
+        # the first line holds the expiry time, empty if there's none
+        if expires.strip() and float(expires) <= self.clock():
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def store(self, key, value, ttl):
+        expires = "" if ttl is None else repr(self.clock() + ttl)
+        # write to a temporary file first so concurrent readers never see
+        # a partial fragment
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding=self.encoding,
+                           newline="") as f:
+                f.write(expires + "\n")
+                f.write(value)
+            os.replace(tmp, self.filename(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.unlink(os.path.join(self.directory, name))
@@ -0,0 +1,192 @@
+"""
+    Splits template source into a stream of tokens in a single pass.
+
+    A token is a (kind, start, end) tuple of offsets into the source. Tags
+    include their markers, e.g. source[start:end] == "{{ i }}". A tag that
+    is never closed gets end None, nothing after it can be tokenized.
+"""
+import re
+from bisect import bisect_left, bisect_right
+
+from .exceptions import ExpressionNotClosed
+
+TEXT = "text"
+EXPRESSION = "expression"
+STATEMENT = "statement"
+COMMENT = "comment"
+
+OPENERS = {"{{": EXPRESSION, "{%": STATEMENT, "{#": COMMENT}
+
+NEWLINE = re.compile("\n")
+
+
+def tag_body(end):
+    """
+        regex matching the inside of a tag up to (not including) end.
+        Quoted strings may contain the end marker, a backslash escapes the
+        next character in a string.
+
+        Every character can only be matched in one way so a failing match
+        does not backtrack exponentially
+    """
+    first, second = re.escape(end[0]), re.escape(end[1])
+    plain = r"""[^'"{}]""".format(first)
+    strings = r"""'[^'\\]*(?:\\.[^'\\]*)*'|"[^"\\]*(?:\\.[^"\\]*)*\""""
+    return r"{plain}*(?:(?:{first}(?!{second})|{strings}){plain}*)*".format(
+        plain=plain, first=first, second=second, strings=strings)
+
+
+TAG_ENDS = {}
+
+
+def scan(source, index, end):
+    """
+        Find the end of a tag whose body starts at index in source,
+        skipping end markers in quoted strings. Returns the offset just
+        past the end marker.
+
+        Raises ExpressionNotClosed if there's no end marker
+    """
+    try:
+        pattern = TAG_ENDS[end]
+    except KeyError:
+        pattern = TAG_ENDS[end] = re.compile(
+            tag_body(end) + re.escape(end), re.S)
+
+    match = pattern.match(source, index)
+    if match is None:
+        raise ExpressionNotClosed()
+    return match.end()
+
+
+TOKEN = re.compile(
+    r"\{{\{{(?P<{}>{})\}}\}}".format(EXPRESSION, tag_body("}}")) +
+    r"|\{{%(?P<{}>{})%\}}".format(STATEMENT, tag_body("%}")) +
+    r"|\{{\#(?P<{}>{})\#\}}".format(COMMENT, tag_body("#}")) +
+    r"|(?P<unclosed>\{[{%#])",
+    re.S)
+
+
+def tokenize(source):
+    tokens = []
+    append = tokens.append
+    index = 0
+
+    for match in TOKEN.finditer(source):
+        start = match.start()
+        if start > index:
+            append((TEXT, index, start))
+
+        kind = match.lastgroup
+        if kind == "unclosed":
+            append((OPENERS[match.group()], start, None))
+            return tokens
+
+        index = match.end()
+        append((kind, start, index))
+
+    if index < len(source):
+        append((TEXT, index, len(source)))
+    return tokens
+
+
+def markers(source, kind, start, end):
+    """
+        Whitespace control for the tag token (kind, start, end). Returns
+        the offsets of the body of the tag without its markers, and
+        whether the whitespace before and after the tag is removed.
+
+        "{%-", "-%}", "{#-" and "-#}" are always markers. "{{-" and "-}}"
+        only when separated from the expression by whitespace, "{{-1}}" is
+        just an expression
+    """
+    start += 2
+    end -= 2
+    before = after = False
+    if start < end and source[start] == "-" and \
+       (kind != EXPRESSION or source[start + 1].isspace()):
+        start += 1
+        before = True
+    if start < end and source[end - 1] == "-" and \
+       (kind != EXPRESSION or source[end - 2].isspace()):
+        end -= 1
+        after = True
+    return start, end, before, after
+
+
+def blank(text):
+    """ does text only contain spaces and tabs """
+    return not text.strip(" \t")
+
+
+class LineIndex:
+    """ Maps offsets in source to 1-based (line, column) positions. The
+        offsets of all newlines are collected once, when first needed """
+
+    def __init__(self, source):
+        self.source = source
+        self.newlines = None
+
+    def position(self, offset):
+        if self.newlines is None:
+            self.newlines = [m.start() for m in NEWLINE.finditer(self.source)]
+
+        # the number of newlines before offset
+        line = bisect_left(self.newlines, offset)
+        start = self.newlines[line - 1] + 1 if line else 0
+        return line + 1, offset - start + 1
+
+
+class Lexer:
+    """ The tokens of a template, shared by all ParseContexts of its
+        source """
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.lines = LineIndex(source)
+        self.starts = [token[1] for token in self.tokens]
+
+    def text(self, i, trim_blocks=False):
+        """
+            The (start, end) of text token i without the whitespace
+            removed by the tags around it.
+
+            With trim_blocks the first newline after a statement or
+            comment is removed, and so are the spaces and tabs before it
+            if it starts a line
+        """
+        source, tokens = self.source, self.tokens
+        _, start, end = tokens[i]
+
+        if i > 0:
+            kind, tag_start, tag_end = tokens[i - 1]
+            if markers(source, kind, tag_start, tag_end)[3]:
+                while start < end and source[start].isspace():
+                    start += 1
+            elif trim_blocks and kind != EXPRESSION and \
+                    source.startswith("\n", start):
+                start += 1
+
+        if i + 1 < len(tokens):
+            kind, tag_start, tag_end = tokens[i + 1]
+            if tag_end is None:
+                pass
+            elif markers(source, kind, tag_start, tag_end)[2]:
+                while end > start and source[end - 1].isspace():
+                    end -= 1
+            elif trim_blocks and kind != EXPRESSION:
+                # only if nothing else precedes the tag on its line
+                line = source.rfind("\n", tokens[i][1], end) + 1
+                if line and blank(source[line:end]):
+                    end = max(line, start)
+                elif not line and i == 0 and blank(source[start:end]):
+                    end = start
+        return start, end
+
+    def find(self, position):
+        """ index of the token containing position, len(tokens) if there's
+            nothing left at position """
+        if position >= len(self.source):
+            return len(self.tokens)
+        return bisect_right(self.starts, position) - 1
@@ -0,0 +1,117 @@
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+from .ate import Template
+from .exceptions import TemplateNotFound
+
+
+class Loader:
+    """
+        Loads templates by name from a list of directories (searched in
+        order) and keeps the compiled Templates in a bounded LRU cache.
+
+        A cached template is only recompiled if the modification time or
+        size of its file changed.
+
+        Parents can be given by name (or as a tuple of names, nearest
+        first, for multiple levels of inheritance). They're resolved
+        through the same cache whenever the template is rendered, so
+        changes to a parent are picked up as well.
+    """
+    template_class = Template
+    encoding = "utf-8"
+
+    def __init__(self, paths, size=128, context_class=None, codegen=None,
+                 compile_cache=None, trim_blocks=None):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.size = size
+        self.context_class = context_class
+        self.codegen = codegen
+        self.compile_cache = compile_cache
+        self.trim_blocks = trim_blocks
+
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __getstate__(self):
+        # the cache (and its lock) is not shared with the copy
+        state = self.__dict__.copy()
+        del state["cache"], state["lock"], state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def compiling(self):
+        """ the names of the templates being compiled by this thread,
+            outermost first, e.g. to detect include cycles """
+        local = self.local
+        if not hasattr(local, "names"):
+            local.names = []
+        return local.names
+
+    def find(self, name):
+        """ return the filename and os.stat() result for template name """
+        for path in self.paths:
+            filename = os.path.normpath(os.path.join(path, name))
+            # don't allow names to escape the search path
+            if not filename.startswith(path + os.sep):
+                continue
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                return filename, st
+        raise TemplateNotFound(name)
+
+    def load(self, name, parent=None):
+        """ return the compiled template for name """
+        if isinstance(parent, list):
+            parent = tuple(parent)
+        key = (name, parent)
+
+        filename, st = self.find(name)
+        version = (st.st_mtime_ns, st.st_size)
+
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None and cached[0] == version:
+                self.cache.move_to_end(key)
+                return cached[1]
+
+        template = self.compile(filename, name, parent)
+
+        with self.lock:
+            self.cache[key] = (version, template)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return template
+
+    def compile(self, filename, name, parent=None):
+        with open(filename, encoding=self.encoding) as f:
+            code = f.read()
+        compiling = self.compiling()
+        compiling.append(name)
+        try:
+            return self.template_class(code, parent=parent,
+                                       context_class=self.context_class,
+                                       codegen=self.codegen, loader=self,
+                                       name=name,
+                                       compile_cache=self.compile_cache,
+                                       trim_blocks=self.trim_blocks)
+        finally:
+            compiling.pop()
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
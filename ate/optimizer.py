@@ -0,0 +1,122 @@
+import ast
+import sys
+
+from .tags import TextNode, CommentNode, ExpressionNode
+from .tags import MainNode, BlockStatementNode, FillBlockStatementNode
+from .tags import ForBlockStatementNode, IfBlockStatementNode
+from .tags import SlotStatementNode, CacheBlockStatementNode
+
+
+# the nodes literal values are parsed into, ast.Constant only exists (and
+# is used for all of them) since python 3.6 (3.8)
+if sys.version_info >= (3, 8):
+    CONSTANTS = (ast.Constant,)
+else:
+    CONSTANTS = tuple(getattr(ast, name) for name in
+                      ("Num", "Str", "Bytes", "NameConstant")
+                      if hasattr(ast, name))
+
+# the parts of an expression made of literals only
+LITERALS = CONSTANTS + (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+                        ast.IfExp, ast.Tuple, ast.List, ast.Dict, ast.Set,
+                        ast.operator, ast.unaryop, ast.cmpop, ast.boolop,
+                        ast.expr_context)
+
+NOT_CONSTANT = object()
+
+
+class Optimizer:
+    """
+        Simplifies a compiled node tree without changing what it renders:
+        comments are removed, expressions made of literals only are
+        evaluated, if blocks with constant conditions are replaced by the
+        branch that is taken and adjacent text is merged into a single
+        TextNode.
+
+        The tree is changed in place. Literals are evaluated with a
+        context of context_class, and only if fold is set: the result is
+        only valid for contexts evaluating expressions the same way
+    """
+    # blocks that render their nodes in order, exact classes since
+    # subclasses may render differently
+    blocks = (MainNode, BlockStatementNode, FillBlockStatementNode,
+              ForBlockStatementNode, SlotStatementNode,
+              CacheBlockStatementNode)
+
+    def __init__(self, context_class, fold=True):
+        self.context = context_class() if fold else None
+        self.fold = fold
+
+    def optimize(self, node):
+        node.nodes = self.nodes(node.nodes)
+        return node
+
+    def constant(self, expression):
+        """ the value of expression if it's made of literals only,
+            NOT_CONSTANT otherwise """
+        if not self.fold or expression.names or \
+           not all(isinstance(n, LITERALS)
+                   for n in ast.walk(expression.tree)):
+            return NOT_CONSTANT
+        try:
+            return self.context.eval(expression)
+        except Exception:
+            # e.g. 1 / 0, leave it to fail while rendering
+            return NOT_CONSTANT
+
+    def nodes(self, nodes):
+        res = []
+        for node in nodes:
+            for node in self.node(node):
+                previous = res[-1] if res else None
+                if node.__class__ is TextNode and \
+                   previous.__class__ is TextNode:
+                    node = TextNode(previous.text + node.text).locate(
+                        previous.offset, previous.lines)
+                    res[-1] = node
+                else:
+                    res.append(node)
+        return res
+
+    def node(self, node):
+        """ return the nodes to render instead of node """
+        klass = node.__class__
+        if klass is CommentNode:
+            return []
+        if klass is ExpressionNode:
+            value = self.constant(node.compiled)
+            if value is NOT_CONSTANT:
+                return [node]
+            return [TextNode(str(value)).locate(node.offset, node.lines)]
+        if klass is IfBlockStatementNode:
+            return self.if_block(node)
+        if klass in self.blocks:
+            return [self.optimize(node)]
+        return [node]
+
+    def if_block(self, node):
+        branches = []
+        for condition, nodes in node.branches:
+            value = self.constant(condition.compiled)
+            if value is NOT_CONSTANT:
+                branches.append((condition, self.nodes(nodes)))
+            elif value:
+                # always taken, the branches after it never are
+                if not branches:
+                    return self.nodes(nodes)
+                node.branches = branches
+                node.orelse = self.nodes(nodes)
+                return [node]
+            # never taken, drop it
+
+        if not branches:
+            return self.nodes(node.orelse or [])
+        node.branches = branches
+        if node.orelse is not None:
+            node.orelse = self.nodes(node.orelse)
+        return [node]
+
+
+def optimize(node, context_class, fold=True):
+    """ optimize the node tree (in place) and return it """
+    return Optimizer(context_class, fold).optimize(node)
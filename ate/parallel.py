@@ -0,0 +1,55 @@
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
+# the template rendered by a worker process, set once when it starts
+_template = None
+
+
+def _initialize(payload):
+    global _template
+    _template = pickle.loads(payload)
+
+
+def _render(chunk):
+    template = _template
+    return ["".join(template.generate_with_context(
+        template.context_class(data))) for data in chunk]
+
+
+def render_many(template, contexts, workers=None, chunksize=64):
+    """
+        Render template for each of contexts (dicts with the data to
+        render with) using a pool of worker processes, yielding the
+        output in the same order as contexts.
+
+        The template is pickled once and sent to each worker when it
+        starts, contexts are sent in chunks of chunksize. contexts may be
+        any iterable, at most a few chunks per worker are in flight at
+        any time
+    """
+    workers = workers or os.cpu_count() or 1
+    payload = pickle.dumps(template, pickle.HIGHEST_PROTOCOL)
+    contexts = iter(contexts)
+
+    with ProcessPoolExecutor(workers, initializer=_initialize,
+                             initargs=(payload,)) as executor:
+        pending = deque()
+        try:
+            while True:
+                chunk = list(islice(contexts, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_render, chunk))
+                if len(pending) > 2 * workers:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # e.g. when the caller stops iterating early
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,240 @@
+"""
+    Opt-in profiling of template rendering.
+
+    While a Profiler is enabled the render/generate methods of all node
+    classes and Context.eval are replaced by timed versions, when it's
+    disabled the originals are restored. Rendering is not slowed down at
+    all while no Profiler is enabled.
+
+        with Profiler() as profiler:
+            template.render(**data)
+        print(profiler.report())
+
+    Nodes are timed inclusive of the nodes inside them ("total") and
+    exclusive of them and of their expressions ("own"). Expressions are
+    counted and timed separately. Only the node interpreter is profiled:
+    code generated by codegen doesn't call the nodes.
+"""
+import threading
+import time
+
+from .ate import Context
+from .tags import Node, TextNode, ExpressionNode, StatementNode
+
+
+def subclasses(klass):
+    """ klass and all its (indirect) subclasses """
+    res = [klass]
+    for subclass in klass.__subclasses__():
+        res.extend(subclasses(subclass))
+    return res
+
+
+class Entry:
+    """ The statistics of a single node or expression """
+    __slots__ = ("kind", "tag", "position", "source", "calls", "total",
+                 "own")
+
+    def __init__(self, kind, tag, position, source):
+        self.kind = kind
+        self.tag = tag
+        self.position = position
+        self.source = source
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+
+    def location(self):
+        if self.position is None:
+            return "?"
+        return "{}:{}".format(*self.position)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def describe(node):
+    """ the tag and source describing node """
+    if isinstance(node, TextNode):
+        return "text", node.text[:40]
+    if isinstance(node, ExpressionNode):
+        return "expression", node.expression.strip()
+    if isinstance(node, StatementNode):
+        return node.type, node.expression.strip()
+    return node.__class__.__name__, ""
+
+
+class Profiler:
+    """
+        Collects the time spent rendering each node and evaluating each
+        expression while enabled. callback, if given, is called with the
+        entries (see Entry.as_dict) collected so far every time the
+        profiler is disabled, e.g. to export them as metrics
+    """
+    clock = staticmethod(time.perf_counter)
+    # only one profiler can replace the methods at a time
+    active = None
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.entries = {}
+        self.local = threading.local()
+        self.originals = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def enable(self):
+        if Profiler.active is not None:
+            raise RuntimeError("Another Profiler is enabled")
+        Profiler.active = self
+
+        for klass in subclasses(Node):
+            for name, wrap in (("render", self.wrap_render),
+                               ("generate", self.wrap_generate)):
+                if name in klass.__dict__:
+                    self.replace(klass, name, wrap)
+        for klass in subclasses(Context):
+            if "eval" in klass.__dict__:
+                self.replace(klass, "eval", self.wrap_eval)
+
+    def disable(self):
+        if Profiler.active is not self:
+            return
+        for klass, name, original in reversed(self.originals):
+            setattr(klass, name, original)
+        self.originals = []
+        Profiler.active = None
+
+        if self.callback is not None:
+            self.callback([entry.as_dict() for entry in self.results()])
+
+    def replace(self, klass, name, wrap):
+        original = klass.__dict__[name]
+        self.originals.append((klass, name, original))
+        setattr(klass, name, wrap(original))
+
+    def stack(self):
+        local = self.local
+        if not hasattr(local, "stack"):
+            local.stack = []
+        return local.stack
+
+    def entry(self, key, kind, details):
+        """ the Entry for key, details() returns its tag and source """
+        entry = self.entries.get(key)
+        if entry is None:
+            tag, source = details()
+            entry = self.entries[key] = Entry(kind, tag, key.position(),
+                                              source)
+        return entry
+
+    def node_entry(self, node):
+        return self.entry(node, "node", lambda: describe(node))
+
+    def enter(self, key, entry):
+        frame = [key, entry, self.clock(), 0.0]
+        self.stack().append(frame)
+        return frame
+
+    def leave(self, frame):
+        stack = self.stack()
+        stack.pop()
+        _, entry, start, children = frame
+        elapsed = self.clock() - start
+        entry.total += elapsed
+        entry.own += elapsed - children
+        if stack:
+            stack[-1][3] += elapsed
+
+    def nested(self, key):
+        """ is key being timed already, e.g. by generate() calling
+            render() """
+        stack = self.stack()
+        return bool(stack) and stack[-1][0] is key
+
+    def wrap_render(self, original):
+        profiler = self
+
+        def render(node, context):
+            if profiler.nested(node):
+                return original(node, context)
+            entry = profiler.node_entry(node)
+            entry.calls += 1
+            frame = profiler.enter(node, entry)
+            try:
+                return original(node, context)
+            finally:
+                profiler.leave(frame)
+        return render
+
+    def wrap_generate(self, original):
+        profiler = self
+
+        def generate(node, context):
+            if profiler.nested(node):
+                yield from original(node, context)
+                return
+            entry = profiler.node_entry(node)
+            entry.calls += 1
+            chunks = original(node, context)
+            try:
+                while True:
+                    # only the time spent producing chunks is counted
+                    frame = profiler.enter(node, entry)
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                    finally:
+                        profiler.leave(frame)
+                    yield chunk
+            finally:
+                chunks.close()
+        return generate
+
+    def wrap_eval(self, original):
+        profiler = self
+
+        def eval(context, expr, *args, **kw):
+            if isinstance(expr, str) or profiler.nested(expr):
+                # e.g. a subclass calling super().eval()
+                return original(context, expr, *args, **kw)
+            entry = profiler.entry(
+                expr, "eval", lambda: ("eval", expr.source.strip()))
+            entry.calls += 1
+            frame = profiler.enter(expr, entry)
+            try:
+                return original(context, expr, *args, **kw)
+            finally:
+                profiler.leave(frame)
+        return eval
+
+    def results(self, kind=None):
+        """ the entries, of kind ("node" or "eval") if given, with the
+            highest total time first """
+        entries = [entry for entry in self.entries.values()
+                   if kind is None or entry.kind == kind]
+        return sorted(entries, key=lambda entry: entry.total, reverse=True)
+
+    def reset(self):
+        self.entries = {}
+
+    def report(self, top=10):
+        """ the top nodes and expressions by total time, as text """
+        lines = []
+        for kind, title in (("node", "Nodes"), ("eval", "Expressions")):
+            lines.append("{} (top {} by total time)".format(title, top))
+            lines.append("{:>8} {:>10} {:>10}  {:<10} {:<12} {}".format(
+                "calls", "total", "own", "location", "tag", "source"))
+            for entry in self.results(kind)[:top]:
+                lines.append(
+                    "{:>8} {:>10.6f} {:>10.6f}  {:<10} {:<12} {}".format(
+                        entry.calls, entry.total, entry.own,
+                        entry.location(), entry.tag, entry.source))
+            lines.append("")
+        return "\n".join(lines)
@@ -3,43 +3,56 @@ from .exceptions import StatementNotFound, UnexpectedClosingFound
 
 
 class Registry:
+    """
+        Keeps track of which tags exist and where they're allowed. Tags
+        are indexed by name, closing tags (e.g. endfor) are kept apart so
+        they can be recognized for error reporting
+    """
 
     def __init__(self):
-        self._reg = []
+        self._tags = {}
+        self._closing = set()
 
     def register(self, tagname, tagclass, parent, direct=False):
-        self._reg.append((tagname, tagclass, parent, direct))
-
-    def find(self, tag, node):
-        any_found = False
-        is_closing = False
-
-        for tagname, nodeclass, parent, direct in self._reg:
-            if tagname == tag:
-                any_found = True
-                if node.__class__ == parent:
-                    return nodeclass
-                if direct:
-                    continue  # must be direct, don't look further
-                n = node
-                while n.parent:
-                    if n.parent.__class__ == parent:
-                        return nodeclass
-                    n = n.parent
-
-            # we're not meant to handle closing tags but detecting it
-            # allows for easier error reports
-            try:
-                if tag == nodeclass.closing:
-                    is_closing = True
-            except AttributeError:
-                # only block statements have a closing tag
-                pass
-        if any_found:
-            # the tag exists but is not allowed in a specific context
-            raise StatementNotAllowed(tag)
-        # did we run into a closing statement? In other words,
-        # opening statement was missing or not parsable
-        if is_closing:
-            raise UnexpectedClosingFound(tag)
-        raise StatementNotFound(tag)
+        self._tags.setdefault(tagname, []).append((tagclass, parent, direct))
+        # only block statements have a closing tag
+        closing = getattr(tagclass, "closing", None)
+        if closing:
+            self._closing.add(closing)
+
+    def ancestry(self, node):
+        """ the classes of node and all its parents """
+        classes = set()
+        while node is not None:
+            classes.add(node.__class__)
+            node = node.parent
+        return classes
+
+    def find(self, tag, node, open_classes=None):
+        """
+            Find the class for tag appearing in node. open_classes, if
+            given, contains the classes of node and all its parents (e.g.
+            maintained while parsing), otherwise the parents of node are
+            walked when needed
+        """
+        rules = self._tags.get(tag)
+        if rules is None:
+            # did we run into a closing statement? In other words,
+            # opening statement was missing or not parsable
+            if tag in self._closing:
+                raise UnexpectedClosingFound(tag)
+            raise StatementNotFound(tag)
+
+        klass = node.__class__
+        for nodeclass, parent, direct in rules:
+            if klass == parent:
+                return nodeclass
+            if direct:
+                continue  # must be direct, don't look further
+            if open_classes is None:
+                open_classes = self.ancestry(node)
+            if parent in open_classes:
+                return nodeclass
+
+        # the tag exists but is not allowed in a specific context
+        raise StatementNotAllowed(tag)
@@ -1,26 +1,79 @@
-import re
-from collections import namedtuple
-
-from .exceptions import ParseError, ExpressionNotClosed
+import ast
+import hashlib
+import numbers
+
+from .expression import Expression
+from .lexer import TEXT, EXPRESSION, STATEMENT, COMMENT, scan, markers
+from .exceptions import ParseError, TemplateNotFound, EvaluationError
+from .exceptions import evaluation_error_message
 from .exceptions import NotClosedError, StatementNotFound
 from .exceptions import StatementNotAllowed, UnexpectedClosingFound
 from .registry import Registry
 
 
 class Node:
+    """
+        Nodes only keep what's needed to render them. Their source is not
+        copied, it's the span offset:end of the template's source (which
+        the LineIndex lines refers to). parent is only needed while
+        compiling and is cleared once the parent is compiled, so it can't
+        be used while rendering
+    """
+    __slots__ = ("parent", "offset", "end", "lines", "_code")
 
     def __init__(self, parent=None):
-        self.code = ""
         self.parent = parent
+        self.offset = None
+        self.end = None
+        self.lines = None
+        self._code = None
+
+    def locate(self, offset, lines):
+        """ remember where the node starts in the template, lines is the
+            template's LineIndex """
+        self.offset = offset
+        self.lines = lines
+        return self
+
+    @property
+    def code(self):
+        """ the source of the node, for block statements only, unless
+            it's been set explicitly (e.g. by a custom tag) """
+        code = getattr(self, "_code", None)
+        if code is not None:
+            return code
+        if self.end is None or self.lines is None:
+            return ""
+        return self.lines.source[self.offset:self.end]
+
+    @code.setter
+    def code(self, code):
+        self._code = code
+
+    def position(self):
+        """ 1-based (line, column) of the node in its template, if known """
+        if self.lines is None:
+            return None
+        return self.lines.position(self.offset)
+
+    def compile_expression(self):
+        """ parse any expression the node evaluates while rendering,
+            raises SyntaxError if it's invalid """
+        pass
 
     def render(self, context):
         return self.code
 
+    def generate(self, context):
+        """ yield the rendered output in chunks """
+        yield self.render(context)
+
     def __str__(self):
         return "Plain node ----\n{}\n----\n".format(self.code)
 
 
 class TextNode(Node):
+    __slots__ = ("text",)
 
     def __init__(self, text, parent=None):
         super().__init__(parent=parent)
@@ -29,24 +82,37 @@ class TextNode(Node):
     def render(self, context):
         return self.text
 
+    def generate(self, context):
+        yield self.text
+
     def __str__(self):
         return "Text node ----\n{}\n----\n".format(self.text)
 
 
 class ExpressionNode(Node):
+    __slots__ = ("expression", "compiled")
 
     def __init__(self, expression, parent=None):
         super().__init__(parent=parent)
         self.expression = expression
+        self.compiled = None
+
+    def compile_expression(self):
+        self.compiled = Expression(self.expression, self.offset,
+                                   self.lines)
 
     def render(self, context):
-        return str(context.eval(self.expression))
+        return str(context.eval(self.compiled))
+
+    def generate(self, context):
+        yield str(context.eval(self.compiled))
 
     def __str__(self):
         return "Statement node ----\n{}\n----\n".format(self.expression)
 
 
 class StatementNode(Node):
+    __slots__ = ("type", "expression")
     open = ''
 
     def __init__(self, type, expression="", parent=None):
@@ -59,12 +125,14 @@ class StatementNode(Node):
 
 
 class CommentNode(StatementNode):
+    __slots__ = ()
 
     def __init__(self, expression="", parent=None):
         super().__init__("comment", expression=expression, parent=parent)
 
 
 class BlockStatementNode(StatementNode):
+    __slots__ = ("nodes",)
     closing = None
     has_block = True
 
@@ -80,6 +148,10 @@ class BlockStatementNode(StatementNode):
             res.append(node.render(context))
         return res
 
+    def generate(self, context):
+        for node in self.nodes:
+            yield from node.generate(context)
+
     def __str__(self):
         return "BlockStatement node {}----\n{}\n----\n".format(
             self.type, self.code)
@@ -87,166 +159,491 @@ class BlockStatementNode(StatementNode):
     def __iter__(self):
         return self.nodes
 
-    def find_start_block(self, code):
-        """ find the start of the nearest block: {{ {% or {# """
-        indexes = []
-
-        for start in ('{%', '{{', '{#'):
-            index = code.find(start)
-            if index != -1:
-                indexes.append(index)
-
-        if indexes:
-            return min(indexes)
-        return -1
-
     def compile(self, pc, index=0):
         res = []
-        code = pc.code
         closing = self.closing
         closing_found = closing is None
 
-        while index < len(code):
-            first_marker = self.find_start_block(code[index:])
-
-            if first_marker == -1:
-                res.append(TextNode(code[index:]))
-                index = len(code)
-                break
-
-            if first_marker > 0:
-                # Is there any text to put in a node?
-                res.append(TextNode(code[index:index + first_marker]))
-                index += first_marker
-
-            if closing and re.match("{{%\s*{}\s*%}}".format(closing),
-                                    code[index:]):
-                closing_found = True
-                index += code[index:].find("%}") + 2
-                break
-
-            node, skip = CompileStatement(pc[index:], parent=self)
-            res.append(node)
-            index += skip
+        lexer = pc.lexer()
+        source, tokens, lines = lexer.source, lexer.tokens, lexer.lines
+        offset = pc.offset  # position of pc in source
+        position = offset + index
+        i = lexer.find(position)
+        trim_blocks = pc.root.trim_blocks
 
+        pc.open_block(self)
+        try:
+            while i < len(tokens):
+                kind, start, end = tokens[i]
+
+                if kind == TEXT:
+                    position = end
+                    # whitespace control by the surrounding tags
+                    start, end = lexer.text(i, trim_blocks)
+                    # index may point inside the first text token
+                    start = max(start, offset + index)
+                    if start < end:
+                        node = TextNode(source[start:end])
+                        res.append(node.locate(start, lines))
+                    i += 1
+                    continue
+
+                if closing and kind == STATEMENT and end is not None:
+                    body_start, body_end, _, _ = markers(source, kind,
+                                                         start, end)
+                    if source[body_start:body_end].strip() == closing:
+                        closing_found = True
+                        position = end
+                        break
+
+                node, skip = CompileStatement(pc[position - offset:],
+                                              parent=self)
+                res.append(node)
+                position += skip
+                i = lexer.find(position)
+        finally:
+            pc.close_block()
+
+        index = position - offset
         if not closing_found:
             raise ParseError("Closing tag {} not found".format(closing),
                              pc)
 
+        # the children's parent was only needed to compile them
+        for node in res:
+            node.parent = None
+
         self.nodes = res
-        self.code = code[:index]
+        if self.lines is None:
+            self.locate(offset, lines)
+        self.end = position
         return index
 
 
 class MainNode(BlockStatementNode):
-    pass
+    __slots__ = ("fills", "includes")
+
+    def __init__(self, type, expression="", nodes=None, parent=None):
+        super().__init__(type, expression, nodes=nodes, parent=parent)
+        self.fills = {}
+        self.includes = frozenset()
+
+    def compile(self, pc, index=0):
+        index = super().compile(pc, index)
+        self.includes = frozenset(pc.root.includes)
+
+        # index the fill blocks by name for the slots of a parent
+        self.fills = {}
+        for node in self.nodes:
+            if isinstance(node, FillBlockStatementNode):
+                self.fills.setdefault(node.expression, node)
+        return index
+
+    def segments(self):
+        """ the nodes to render, with the text of consecutive static
+            nodes merged into single strings """
+        res = []
+        for node in self.nodes:
+            if isinstance(node, CommentNode):
+                continue
+            if isinstance(node, TextNode):
+                if res and isinstance(res[-1], str):
+                    res[-1] += node.text
+                else:
+                    res.append(node.text)
+            else:
+                res.append(node)
+        return res
 
 
 class FillBlockStatementNode(BlockStatementNode):
+    __slots__ = ()
     open = 'fill'
     closing = 'endfill'
 
 
+class Loop:
+    """ The 'loop' variable available in a for loop """
+    __slots__ = ("index", "index0", "first", "last")
+
+    def update(self, i, last):
+        self.index = i
+        self.index0 = i + 1
+        self.first = i == 0
+        self.last = last
+
+    def __repr__(self):
+        return "Loop(index={}, index0={}, first={}, last={})".format(
+            self.index, self.index0, self.first, self.last)
+
+
 class ForBlockStatementNode(BlockStatementNode):
+    __slots__ = ("var", "compiled")
     open = 'for'
     closing = 'endfor'
 
+    def __init__(self, type, expression="", nodes=None, parent=None):
+        super().__init__(type, expression, nodes=nodes, parent=parent)
+        self.var = None
+        self.compiled = None
+
+    def compile_expression(self):
+        var, _in, expr = self.expression.partition(" in ")
+        self.var = var.strip()
+        self.compiled = Expression(expr, self.offset, self.lines)
+
     def looper(self, sequence):
-        looptype = namedtuple("Loop", ["index", "index0", "first", "last"])
-        l = len(sequence)
+        """ yield (loop, element) for all elements of any iterable. The
+            same Loop is updated for every element, 'last' is known by
+            looking one element ahead """
+        loop = Loop()
+        iterator = iter(sequence)
+        try:
+            element = next(iterator)
+        except StopIteration:
+            return
+
+        i = 0
+        for following in iterator:
+            loop.update(i, False)
+            yield loop, element
+            element = following
+            i += 1
 
-        for i, v in enumerate(sequence):
-            yield looptype(i, i + 1, i == 0, i == l - 1), v
+        loop.update(i, True)
+        yield loop, element
 
     def render(self, context):
-        var, _in, expr = self.expression.partition(" in ")
-        var = var.strip()
-        seq = context.eval(expr.strip())
+        var = self.var
+        seq = context.eval(self.compiled)
 
         res = []
+        # a single scope for the entire loop, the loop variables are
+        # assigned directly for each element (in the merged names as well
+        # as the scope itself, see Context.reset)
+        scope = {var: None, 'loop': None}
+        context.push(scope)
+        names = context.names
         for loop, element in self.looper(seq):
-            context.push({var: element, 'loop': loop})
+            names[var] = scope[var] = element
+            names['loop'] = scope['loop'] = loop
             for node in self.nodes:
                 res.append(node.render(context))
-            context.pop()
+        context.pop()
 
         return res
 
+    def generate(self, context):
+        var = self.var
+        seq = context.eval(self.compiled)
+
+        scope = {var: None, 'loop': None}
+        context.push(scope)
+        names = context.names
+        for loop, element in self.looper(seq):
+            names[var] = scope[var] = element
+            names['loop'] = scope['loop'] = loop
+            for node in self.nodes:
+                yield from node.generate(context)
+        context.pop()
+
 
 class IfBlockStatementNode(BlockStatementNode):
+    __slots__ = ("compiled", "branches", "orelse")
     open = 'if'
     closing = 'endif'
 
-    def render(self, context):
-        res = []
-        t, f = [], []
+    def __init__(self, type, expression="", nodes=None, parent=None):
+        super().__init__(type, expression, nodes=nodes, parent=parent)
+        self.compiled = None
+        self.branches = []
+        self.orelse = None
 
-        current = t
+    def compile_expression(self):
+        self.compiled = Expression(self.expression, self.offset,
+                                   self.lines)
+
+    def compile(self, pc, index=0):
+        index = super().compile(pc, index)
+
+        # split the nodes into branches once: a list of (node, nodes)
+        # where node is the if or an elif providing the condition, and
+        # the nodes for the else
+        self.branches = [(self, [])]
+        self.orelse = None
+        current = self.branches[0][1]
         for node in self.nodes:
-            if isinstance(node, ElseInIfStatementNode):
-                current = f
+            if isinstance(node, (ElifInIfStatementNode,
+                                 ElseInIfStatementNode)):
+                if self.orelse is not None:
+                    raise ParseError("{} after else".format(node.type), pc)
+                if isinstance(node, ElifInIfStatementNode):
+                    self.branches.append((node, []))
+                    current = self.branches[-1][1]
+                else:
+                    current = self.orelse = []
             else:
                 current.append(node)
+        return index
 
-        if context.eval(self.expression):
-            for node in t:
-                res.append(node.render(context))
-        else:
-            for node in f:
-                res.append(node.render(context))
+    def select(self, context):
+        """ return the nodes of the branch whose condition holds """
+        for condition, nodes in self.branches:
+            if context.eval(condition.compiled):
+                return nodes
+        return self.orelse or ()
+
+    def render(self, context):
+        res = []
+        for node in self.select(context):
+            res.append(node.render(context))
         return res
 
+    def generate(self, context):
+        for node in self.select(context):
+            yield from node.generate(context)
+
+
+class ElifInIfStatementNode(StatementNode):
+    """ Should only be allowed inside if blockstatement """
+    __slots__ = ("compiled",)
+    open = 'elif'
+
+    def __init__(self, type, expression="", parent=None):
+        super().__init__(type, expression, parent=parent)
+        self.compiled = None
+
+    def compile_expression(self):
+        self.compiled = Expression(self.expression, self.offset,
+                                   self.lines)
+
 
 class ElseInIfStatementNode(StatementNode):
     """ Should only be allowed inside if blockstatement """
+    __slots__ = ()
     open = 'else'
 
 
 class SlotStatementNode(BlockStatementNode):
+    __slots__ = ()
     open = 'slot'
     closing = 'endslot'
 
-    def render(self, context):
-        res = []
+    def select(self, tpl):
+        """
+            Decide what to render for child template tpl: the child's fill
+            block for this slot, the entire child if it has no fill blocks
+            at all, or (None) the slot's own body
+        """
+        fills = tpl.mainnode.fills
+        if not fills:
+            return tpl
+        return fills.get(self.expression or "main")
 
-        blockname = self.expression or "main"
-        block_found = False
+    def render(self, context):
+        children = context.children
         # is there a child to pop? E.g. rendering base template directly
-        if context.child():
-            with context.popchild() as tpl:
-                for node in tpl.mainnode.nodes:
-                    if isinstance(node, FillBlockStatementNode):
-                        block_found = True
-                        if node.expression == blockname:
-                            res.append(node.render(context))
-                            break
-                else:
-                    if not block_found:
-                        # use entire template as matching block
-                        block_found = True
-                        res.append(tpl.render_with_context(
-                            context,
-                            start_at_parent=False))
-                    else:
-                        # render the body of the block
-                        for node in self.nodes:
-                            res.append(node.render(context))
-        else:
-            # render the body of the block
-            for node in self.nodes:
-                res.append(node.render(context))
-        return res
+        if not children:
+            return super().render(context)
+
+        # slots in whatever is rendered refer to the next child
+        tpl = children.pop()
+        try:
+            selected = self.select(tpl)
+            if selected is tpl:
+                return tpl.render_with_context(context,
+                                               start_at_parent=False)
+            if selected is not None:
+                return selected.render(context)
+            return super().render(context)
+        finally:
+            children.append(tpl)
+
+    def generate(self, context):
+        children = context.children
+        if not children:
+            yield from super().generate(context)
+            return
+
+        tpl = children.pop()
+        try:
+            selected = self.select(tpl)
+            if selected is tpl:
+                yield from tpl.generate_with_context(context,
+                                                     start_at_parent=False)
+            elif selected is not None:
+                yield from selected.generate(context)
+            else:
+                yield from super().generate(context)
+        finally:
+            children.append(tpl)
+
+
+class CacheBlockStatementNode(BlockStatementNode):
+    """
+        {% cache key ttl %}..{% endcache %} renders its body once and
+        keeps the output in the context's fragment_cache under key for
+        ttl seconds. ttl is optional, both are expressions.
+
+        The fragment cache is shared by all templates, keys are only
+        unique within the template (by name and source) using them
+    """
+    __slots__ = ("key", "ttl", "namespace")
+    open = 'cache'
+    closing = 'endcache'
+
+    def __init__(self, type, expression="", nodes=None, parent=None):
+        super().__init__(type, expression, nodes=nodes, parent=parent)
+        self.key = None
+        self.ttl = None
+        self.namespace = None
+
+    def compile(self, pc, index=0):
+        root = pc.root
+        self.namespace = (root.name, hashlib.sha1(root.source.encode(
+            "utf-8", "surrogatepass")).hexdigest())
+        return super().compile(pc, index)
+
+    def compile_expression(self):
+        # the ttl is the last part of the expression, if what's before
+        # it is a valid expression as well
+        key, _, ttl = self.expression.strip().rpartition(" ")
+        if key.strip():
+            try:
+                self.key = Expression(key, self.offset, self.lines)
+                self.ttl = Expression(ttl, self.offset, self.lines)
+                return
+            except SyntaxError:
+                pass
+        self.key = Expression(self.expression, self.offset, self.lines)
+        self.ttl = None
+
+    def cache_key(self, key):
+        """ the key to cache the fragment for (evaluated) key under """
+        try:
+            hash(key)
+        except TypeError as e:
+            raise EvaluationError(evaluation_error_message(e, self.key),
+                                  self.key) from e
+        return self.namespace, key
+
+    def check_ttl(self, ttl):
+        """ return the (evaluated) ttl if it's a number of seconds """
+        if ttl is not None and (isinstance(ttl, bool) or
+                                not isinstance(ttl, numbers.Real)):
+            error = TypeError("ttl must be a number, not {}".format(
+                ttl.__class__.__name__))
+            raise EvaluationError(evaluation_error_message(error, self.ttl),
+                                  self.ttl)
+        return ttl
+
+    def lookup(self, context):
+        """ return the fragment cache, key, ttl and the cached output
+            (None if it's not cached). Errors are never hidden behind a
+            placeholder, which would be a key shared by every render """
+        cache = context.fragment_cache
+        key = self.cache_key(context.eval(self.key, strict=True))
+        ttl = None if self.ttl is None else \
+            self.check_ttl(context.eval(self.ttl, strict=True))
+        return cache, key, ttl, cache.get(key)
+
+    def render(self, context):
+        cache, key, ttl, value = self.lookup(context)
+        if value is None:
+            value = "".join(super().generate(context))
+            cache.set(key, value, ttl)
+        return value
+
+    def generate(self, context):
+        yield self.render(context)
+
+
+class IncludeStatementNode(StatementNode):
+    """
+        {% include 'name' %} renders the template name, loaded through the
+        loader of the template being rendered, as part of the output. The
+        included template sees the names of the including template.
+
+        The template is loaded when compiling as well, to make sure it
+        exists and doesn't include the template being compiled
+    """
+    __slots__ = ("name",)
+    open = 'include'
+
+    def __init__(self, type, expression="", parent=None):
+        super().__init__(type, expression, parent=parent)
+        self.name = None
+
+    def compile(self, pc, index=0):
+        try:
+            name = ast.literal_eval(self.expression.strip())
+        except (SyntaxError, ValueError):
+            name = None
+        if not isinstance(name, str):
+            raise ParseError("Include needs a template name", pc)
+        self.name = name
+
+        root = pc.root
+        loader = root.loader
+        if loader is None:
+            raise ParseError("Include needs a loader", pc)
+
+        compiling = loader.compiling()
+        if name in compiling:
+            cycle = compiling[compiling.index(name):] + [name]
+            raise ParseError("Include cycle: {}".format(" -> ".join(cycle)),
+                             pc)
+        try:
+            template = loader.load(name)
+        except TemplateNotFound as e:
+            raise ParseError("Included template not found", pc) from e
+        # a template compiled before may have been changed to include us
+        if root.name is not None and \
+           root.name in template.mainnode.includes:
+            raise ParseError("Include cycle: {} -> {} -> {}".format(
+                root.name, name, root.name), pc)
+
+        root.includes.add(name)
+        root.includes.update(template.mainnode.includes)
+        return index
+
+    def template(self, context):
+        loader = context.loader
+        if loader is None:
+            raise TemplateNotFound(self.name)
+        return loader.load(self.name)
+
+    def render(self, context):
+        template = self.template(context)
+        # the included template is not part of the inheritance chain
+        children, context.children = context.children, []
+        try:
+            return template.render_with_context(context)
+        finally:
+            context.children = children
+
+    def generate(self, context):
+        template = self.template(context)
+        children, context.children = context.children, []
+        try:
+            yield from template.generate_with_context(context)
+        finally:
+            context.children = children
 
 
 registry = Registry()
 
 registry.register('for', ForBlockStatementNode, MainNode)
 registry.register('if', IfBlockStatementNode, MainNode)
+registry.register('elif', ElifInIfStatementNode,
+                  IfBlockStatementNode, direct=True)
 registry.register('else', ElseInIfStatementNode,
                   IfBlockStatementNode, direct=True)
 # registry.register('else', ForBlockStatementNode, direct=True)
 registry.register('slot', SlotStatementNode, MainNode)
 registry.register('fill', FillBlockStatementNode, MainNode)
+registry.register('cache', CacheBlockStatementNode, MainNode)
+registry.register('include', IncludeStatementNode, MainNode)
 
 
 def parse_expression(code, start="{{", end="}}"):
@@ -254,37 +651,13 @@ def parse_expression(code, start="{{", end="}}"):
         supporting string expressions containing start/end
         markers. Code may contain trailing code
 
-        return index where parsing ends including parsing of endmarker
+        return the expression and the index where parsing ends including
+        parsing of endmarker
     """
     assert code[:2] == start
 
-    escape_mode = False
-    string_mode = ''  # can be ' " or empty
-    res = ''
-
-    for index in range(2, len(code)):
-        c = code[index]
-
-        if string_mode:
-            if not escape_mode:
-                if c == string_mode:
-                    string_mode = False
-                if c == '\\':
-                    escape_mode = True
-            else:
-                escape_mode = False
-
-        elif c in "'\"":
-            string_mode = c
-
-        elif code[index:index + 2] == end:
-            # 'end' ends the expression and we're not inside a string
-            index += 1  # we read one } ahead (assume end is 2 characters)
-            break
-        res += c
-    else:
-        raise ExpressionNotClosed()
-    return res, index + 1
+    index = scan(code, 2, end)
+    return code[2:index - 2], index
 
 
 def parse_statement(code):
@@ -307,32 +680,46 @@ def CompileStatement(pc, parent=None):
     """
     parent = parent or MainNode("main")
 
-    # we have a parse context. catch errors and add line numbers etc?
-    if pc.code[1] == '{':  # expression statement
-        try:
-            expr, end = parse_expression(pc.code)
-        except ExpressionNotClosed as e:
-            raise ParseError("Expression not closed", pc) from e
-        return ExpressionNode(expr), end
+    lexer = pc.lexer()
+    kind, start, end = lexer.tokens[lexer.find(pc.offset)]
+    source = lexer.source
 
-    if pc.code[1] == '#':  # comment
+    if kind == EXPRESSION:
+        if end is None:
+            raise ParseError("Expression not closed", pc)
+        body_start, body_end, _, _ = markers(source, kind, start, end)
+        node = ExpressionNode(source[body_start:body_end])
+        node.locate(start, lexer.lines)
         try:
-            expr, end = parse_comment(pc.code)
-        except ExpressionNotClosed as e:
-            raise ParseError("Comment not closed", pc) from e
-        return CommentNode(expr), end
-
-    try:
-        statement, end = parse_statement(pc.code)
-    except ExpressionNotClosed as e:
-        raise ParseError("Statement not closed", pc) from e
-    statement = statement.strip()
+            node.compile_expression()
+        except SyntaxError as e:
+            raise ParseError("Invalid expression", pc) from e
+        return node, end - start
+
+    if kind == COMMENT:
+        if end is None:
+            raise ParseError("Comment not closed", pc)
+        body_start, body_end, _, _ = markers(source, kind, start, end)
+        node = CommentNode(source[body_start:body_end])
+        return node.locate(start, lexer.lines), end - start
+
+    if end is None:
+        raise ParseError("Statement not closed", pc)
+    body_start, body_end, _, _ = markers(source, kind, start, end)
+    statement = source[body_start:body_end].strip()
+    end -= start
 
     main, _, expr = statement.partition(" ")
 
     pc.tag = main
+    # the classes of all open blocks are known while parsing, unless
+    # we're called directly
+    root = pc.root
+    open_classes = None
+    if root.blocks and root.blocks[-1] is parent:
+        open_classes = root.open_classes
     try:
-        klass = registry.find(main, parent)
+        klass = registry.find(main, parent, open_classes)
     except NotClosedError as e:
         raise ParseError("Statement not closed", pc) from e
     except StatementNotFound as e:
@@ -343,9 +730,17 @@ def CompileStatement(pc, parent=None):
         raise ParseError("Unexpected closing statement found", pc) from e
 
     node = klass(main, expr, parent=parent)
+    node.locate(start, lexer.lines)
     pc.node = node
 
     end = node.compile(pc, end)
 
+    # only validate the expression once the body is known to be sound,
+    # structural errors inside the block are more useful to report
+    try:
+        node.compile_expression()
+    except SyntaxError as e:
+        raise ParseError("Invalid expression", pc) from e
+
     # No node is inserted, it purely returns body
     return node, end
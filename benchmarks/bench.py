@@ -0,0 +1,221 @@
+"""
+    Benchmarks for compiling and rendering templates.
+
+    python benchmarks/bench.py [--quick] [--output results.json]
+                               [--compare baseline.json] [-k name]
+
+    Every benchmark reports the best, median and mean time of a number of
+    runs and the peak memory allocated by a single run (measured in a
+    separate run, tracemalloc slows things down). The results are written
+    as JSON so they can be compared with an earlier run using --compare.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from ate import __version__  # noqa: E402
+from ate.ate import Template  # noqa: E402
+
+
+class Benchmark:
+    """ A named function to time. setup() is called once, and not timed """
+
+    def __init__(self, name, group, function, setup=None, **params):
+        self.name = name
+        self.group = group
+        self.function = function
+        self.setup = setup
+        self.params = params
+
+    def run(self, repeat):
+        argument = self.setup() if self.setup else None
+        function = self.function
+
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            function(argument)
+            times.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function(argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "name": self.name,
+            "group": self.group,
+            "params": self.params,
+            "runs": repeat,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "peak_memory": peak,
+        }
+
+
+def small_source():
+    return "Hello {{ name }}, you have {{ count }} new messages."
+
+
+def large_source(blocks=500):
+    part = ("<div class=\"item\">\n"
+            "  <h2>{{ title }}</h2>\n"
+            "  {% if count > 1 %}{{ count }} items{% else %}one item"
+            "{% endif %}\n"
+            "  {% for i in items %}<span>{{ i }}</span>{% endfor %}\n"
+            "  {# a comment #}\n"
+            "</div>\n")
+    return part * blocks
+
+
+def nested_source(depth=50):
+    opening = "".join("{{% if level > {} %}}<div>".format(-i)
+                      for i in range(depth))
+    closing = "</div>{% endif %}" * depth
+    return opening + "{{ level }}" + closing
+
+
+def loop_source():
+    return ("{% for i in items %}<li>{{ i }}{% if loop.last %}.{% endif %}"
+            "</li>{% endfor %}")
+
+
+def if_source(conditions=50):
+    return "".join("{{% if i == {0} %}}{0}{{% elif i > {0} %}}+"
+                   "{{% else %}}-{{% endif %}}".format(n)
+                   for n in range(conditions))
+
+
+def inheritance_chain(levels, codegen):
+    """ levels templates, each filling the slot of the previous one """
+    parent = Template("<html>{% slot %}{% endslot %}</html>",
+                      codegen=codegen)
+    for level in range(levels):
+        parent = Template("{{% fill main %}}<div>{}{{{{ value }}}}"
+                          "{{% slot %}}{{% endslot %}}</div>"
+                          "{{% endfill %}}".format(level),
+                          parent=parent, codegen=codegen)
+    return parent
+
+
+def benchmarks(quick=False):
+    sizes = [10 ** 3, 10 ** 4]
+    if not quick:
+        sizes += [10 ** 5, 10 ** 6]
+    res = []
+
+    for name, source in (("small", small_source()),
+                         ("large", large_source()),
+                         ("nested", nested_source())):
+        res.append(Benchmark("compile-" + name, "compile",
+                             lambda _, source=source: Template(source),
+                             size=len(source)))
+
+    for codegen in (False, True):
+        mode = "codegen" if codegen else "interpreter"
+
+        for size in sizes:
+            res.append(Benchmark(
+                "for-{}-{}".format(size, mode), "render",
+                lambda tpl, size=size: tpl.render(items=range(size)),
+                setup=lambda codegen=codegen: Template(loop_source(),
+                                                       codegen=codegen),
+                items=size, codegen=codegen))
+
+        res.append(Benchmark(
+            "if-{}".format(mode), "render",
+            lambda tpl: [tpl.render(i=i) for i in range(100)],
+            setup=lambda codegen=codegen: Template(if_source(),
+                                                   codegen=codegen),
+            renders=100, codegen=codegen))
+
+        res.append(Benchmark(
+            "large-{}".format(mode), "render",
+            lambda tpl: tpl.render(title="title", count=2,
+                                   items=range(10)),
+            setup=lambda codegen=codegen: Template(large_source(),
+                                                   codegen=codegen),
+            codegen=codegen))
+
+        for levels in (1, 5, 20):
+            res.append(Benchmark(
+                "inheritance-{}-{}".format(levels, mode), "render",
+                lambda tpl: [tpl.render(value=i) for i in range(100)],
+                setup=lambda levels=levels, codegen=codegen:
+                    inheritance_chain(levels, codegen),
+                levels=levels, renders=100, codegen=codegen))
+    return res
+
+
+def compare(results, baseline):
+    """ print how results changed relative to baseline, by median time """
+    previous = {r["name"]: r for r in baseline["results"]}
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"]
+        print("{:<32} {:>10.6f}s -> {:>10.6f}s  {:+.1%}".format(
+            result["name"], before["median"], result["median"], ratio - 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller workloads, fewer runs")
+    parser.add_argument("--repeat", type=int, default=None,
+                        help="number of timed runs per benchmark")
+    parser.add_argument("--output", "-o", help="write JSON results here "
+                        "(default: standard output)")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("-k", dest="select", default="",
+                        help="only run benchmarks whose name contains this")
+    args = parser.parse_args(argv)
+
+    repeat = args.repeat or (3 if args.quick else 5)
+    results = []
+    for benchmark in benchmarks(args.quick):
+        if args.select not in benchmark.name:
+            continue
+        result = benchmark.run(repeat)
+        print("{:<32} {:>10.6f}s {:>12} bytes".format(
+            result["name"], result["median"], result["peak_memory"]),
+            file=sys.stderr)
+        results.append(result)
+
+    report = {
+        "ate": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
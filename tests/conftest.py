@@ -0,0 +1,5 @@
+import sys
+
+# asynchronous rendering needs async generators (python 3.6), the tests
+# use asyncio.run (python 3.7)
+collect_ignore = ["test_async.py"] if sys.version_info < (3, 7) else []
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from ate.asyncrender import agenerate
+from ate.ate import Template, Context
+from ate.fragmentcache import MemoryFragmentCache
+from ate.loader import Loader
+from ate.tags import Node
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def value(v, delay=0):
+    await asyncio.sleep(delay)
+    return v
+
+
+class TestRenderAsync:
+
+    def test_plain(self):
+        tpl = Template("Hello {{name}}!")
+        assert run(tpl.render_async(name="World")) == "Hello World!"
+
+    def test_awaitable(self):
+        tpl = Template("Hello {{name}}!")
+        assert run(tpl.render_async(name=value("World"))) == "Hello World!"
+
+    def test_awaited_once(self):
+        tpl = Template("{{a}}{{a}}{%if a == 1%}!{%endif%}")
+        assert run(tpl.render_async(a=value(1))) == "11!"
+
+    def test_concurrent(self):
+        """ independent awaitables are awaited concurrently """
+        running = []
+
+        async def fetch(v):
+            running.append(v)
+            await asyncio.sleep(0.01)
+            # all of them have started before any of them finishes
+            assert len(running) == 3
+            return v
+
+        tpl = Template("{{a}}{{b}}{{c}}")
+        assert run(tpl.render_async(a=fetch(1), b=fetch(2),
+                                    c=fetch(3))) == "123"
+
+    def test_call(self):
+        class Math:
+            async def double(self, i):
+                return i * 2
+
+        tpl = Template("{{math.double(i)}}")
+        assert run(tpl.render_async(math=Math(), i=2)) == "4"
+
+    def test_async_for(self):
+        async def seq():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+
+        tpl = Template("{%for i in s%}{{i}}{%if loop.last%}.{%endif%}"
+                       "{%endfor%}")
+        assert run(tpl.render_async(s=seq())) == "012."
+
+    def test_async_for_empty(self):
+        async def seq():
+            return
+            yield
+
+        tpl = Template("[{%for i in s%}{{i}}{%endfor%}]")
+        assert run(tpl.render_async(s=seq())) == "[]"
+
+    def test_awaitable_elements(self):
+        tpl = Template("{%for i in s%}{{i + 1}}{%endfor%}")
+        assert run(tpl.render_async(s=[value(1), value(2)])) == "23"
+
+    def test_error(self):
+        async def fail():
+            raise ValueError("nope")
+
+        # awaitables passed in are awaited before rendering starts
+        tpl = Template("{{ x }}")
+        with pytest.raises(ValueError):
+            run(tpl.render_async(x=fail()))
+
+    def test_error_while_rendering(self):
+        async def fail():
+            raise ValueError("nope")
+
+        tpl = Template("{%for i in s%}{{i}}{%endfor%}")
+        with pytest.raises(ValueError):
+            run(tpl.render_async(s=[fail()]))
+
+    def test_same_as_render(self):
+        tpl = Template("{%for i in j%}{%if i > 1%}{{i}}{%elif i%}one"
+                       "{%else%}zero{%endif%}{%endfor%}")
+        assert run(tpl.render_async(j=[0, 1, 2])) == tpl.render(j=[0, 1, 2])
+
+    def test_inheritance(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER")
+        c1 = Template("This is the body {% slot %}{% endslot %}",
+                      parent=base)
+        c2 = Template("{{ end }}", parent=c1)
+        assert run(c2.render_async(end=value("The end..."))) == \
+            "HEAD This is the body The end... FOOTER"
+
+    def test_generate_async(self):
+        async def collect():
+            tpl = Template("a{{b}}c")
+            return [chunk async for chunk in tpl.generate_async(b=value(1))]
+
+        assert run(collect()) == ["a", "1", "c"]
+
+    def test_cache(self):
+        class CachingContext(Context):
+            fragment_cache = MemoryFragmentCache()
+
+        tpl = Template("{% cache 'k' %}{{ v }}{% endcache %}",
+                       context_class=CachingContext)
+        assert run(tpl.render_async(v=value("async"))) == "async"
+        assert tpl.render(v="sync") == "async"
+
+    def test_include(self, tmp_path):
+        (tmp_path / "part.html").write_text("{{ b }}")
+        (tmp_path / "page.html").write_text("<{% include 'part.html' %}>")
+        page = Loader(str(tmp_path)).load("page.html")
+        assert run(page.render_async(b=value(1))) == "<1>"
+
+    def test_custom_nodes(self):
+        """ nodes render asynchronously through their agenerate(), if
+            they have one, or else their generate() """
+        class SyncNode(Node):
+            def render(self, context):
+                return "sync"
+
+        class AsyncNode(Node):
+            async def agenerate(self, context):
+                yield await value("async")
+
+        async def collect(node):
+            return [chunk async for chunk in agenerate(node, Context())]
+
+        assert run(collect(SyncNode())) == ["sync"]
+        assert run(collect(AsyncNode())) == ["async"]
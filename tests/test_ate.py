@@ -1,6 +1,10 @@
+import ast
+import collections
+
 import pytest
+import simpleeval
 
-from ate.ate import Template, ParseContext
+from ate.ate import Template, ParseContext, Context, flatten
 from ate.tags import CompileStatement
 from ate.tags import TextNode
 from ate.tags import ExpressionNode
@@ -8,9 +12,11 @@ from ate.tags import BlockStatementNode
 from ate.tags import MainNode
 from ate.tags import ForBlockStatementNode
 from ate.tags import CommentNode
+from ate.tags import StatementNode, registry
 
-from ate.tags import parse_expression
-from ate.exceptions import ExpressionNotClosed
+from ate.tags import parse_expression, parse_statement, parse_comment
+from ate.expression import Expression
+from ate.exceptions import ExpressionNotClosed, ParseError, EvaluationError
 
 
 class TestMyTpl:
@@ -262,3 +268,212 @@ class TestExpressionParser:
         res, index = parse_expression("{{ }} }}")
         assert res == " "
         assert index == 5
+
+
+class TestCompiledExpression:
+
+    def test_expression_compiled(self):
+        tpl = Template("{{ i + 1 }}")
+        node = tpl.mainnode.nodes[0]
+        assert isinstance(node.compiled, Expression)
+        assert node.compiled.source == " i + 1 "
+
+    def test_for_compiled(self):
+        tpl = Template("{% for i in abc %}{% endfor %}")
+        node = tpl.mainnode.nodes[0]
+        assert node.var == "i"
+        assert isinstance(node.compiled, Expression)
+
+    def test_invalid_expression(self):
+        with pytest.raises(ParseError) as e:
+            Template("Hello {{ 1 + }}")
+        assert e.value.pc.offset == 6
+
+    def test_invalid_if_expression(self):
+        with pytest.raises(ParseError):
+            Template("{% if 1 + %}x{% endif %}")
+
+    def test_no_parse_on_render(self, monkeypatch):
+        tpl = Template("{% for i in seq %}{% if i %}{{ i * 2 }}{% endif %}"
+                       "{% endfor %}")
+
+        def fail(*args, **kw):
+            raise AssertionError("expression parsed while rendering")
+
+        monkeypatch.setattr(ast, "parse", fail)
+        assert tpl.render(seq=[0, 1, 2]) == "24"
+
+
+class TestFlatten:
+
+    def test_flat(self):
+        assert flatten(["a", "b", "c"]) == "abc"
+
+    def test_nested(self):
+        assert flatten(["a", ["b", ["c", []], "d"], "e"]) == "abcde"
+
+    def test_empty(self):
+        assert flatten([]) == ""
+
+    def test_render_nested(self):
+        tpl = Template("{%for i in j%}{%if i%}{{i}}{%endif%}-{%endfor%}")
+        assert flatten(tpl.render_nested(j=[0, 1, 2])) == tpl.render(
+            j=[0, 1, 2])
+
+
+class TestParseContext:
+
+    def test_view(self):
+        pc = ParseContext("Hello {{ world }}")
+        sub = pc[6:]
+        assert sub.offset == 6
+        assert sub.source is pc.source
+        assert sub.code == "{{ world }}"
+        assert len(sub) == 11
+        assert sub[0] == "{"
+        assert sub[-1] == "}"
+
+    def test_nested_view(self):
+        pc = ParseContext("0123456789")
+        sub = pc[2:8][1:3]
+        assert sub.offset == 3
+        assert sub.code == "34"
+        assert sub.root is pc
+
+    def test_shared_lexer(self):
+        pc = ParseContext("a{{b}}c")
+        assert pc[1:].lexer() is pc.lexer()
+
+
+class TestStatementParser:
+
+    def test_statement(self):
+        res, index = parse_statement("{% if '%}' %} x")
+        assert res == " if '%}' "
+        assert index == 13
+
+    def test_comment(self):
+        res, index = parse_comment("{# {{ '#}' }} #}")
+        assert res == " {{ '#}' }} "
+        assert index == 16
+
+    def test_comment_not_closed(self):
+        with pytest.raises(ExpressionNotClosed):
+            parse_comment("{# hello")
+
+
+class TestContext:
+
+    def test_push_pop(self):
+        context = Context({"a": 1, "b": 2})
+        context.push({"a": 3, "c": 4})
+        assert context.names == {"a": 3, "b": 2, "c": 4}
+        context.pop()
+        assert context.names == {"a": 1, "b": 2}
+
+    def test_nested(self):
+        context = Context({"a": 1})
+        with context({"a": 2}):
+            with context({"a": 3}):
+                assert context.eval("a") == 3
+            assert context.eval("a") == 2
+        assert context.eval("a") == 1
+
+    def test_missing(self):
+        context = Context({})
+        with pytest.raises(EvaluationError):
+            context.eval("a")
+
+    def test_mapping(self):
+        """ mappings that only implement __getitem__ """
+        class Mapping:
+            def __getitem__(self, name):
+                if name == "a":
+                    return 1
+                raise KeyError(name)
+
+        tpl = Template("{{ a }}{% for b in '2' %}{{ a }}{{ b }}{% endfor %}")
+        assert tpl.render(context=Context(Mapping())) == "112"
+
+    def test_defaultdict(self):
+        context = Context(collections.defaultdict(lambda: "x", a=1))
+        assert context.eval("a") == 1
+        assert context.eval("b") == "x"
+
+    def test_push_mapping(self):
+        context = Context({"a": 1, "b": 2})
+        with context({"a": 3}):
+            with context(collections.defaultdict(int, b=4)):
+                # the innermost scope defines every name
+                assert (context.eval("a"), context.eval("b")) == (0, 4)
+            assert (context.eval("a"), context.eval("b")) == (3, 2)
+        assert context.names == {"a": 1, "b": 2}
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_loop_scope(self, codegen):
+        """ the scope of a loop on the stack is kept up to date """
+        class StackContext(Context):
+            functions = {"top": lambda: context.stack[-1]["i"]}
+
+        context = StackContext({"j": [1, 2]})
+        tpl = Template("{% for i in j %}{{ top() }}{% endfor %}",
+                       codegen=codegen)
+        assert tpl.render(context=context) == "12"
+
+    def test_missing_attribute(self):
+        tpl = Template("{{ d.nope }}")
+        assert tpl.render(d={}) == "??d.nope ??"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_evaluator_eval(self, codegen):
+        """ the evaluator's own eval() is used, it resets its limits """
+        class CompoundContext(Context):
+            evaluator_class = simpleeval.EvalWithCompoundTypes
+
+        tpl = Template("{{ [x for x in r][-1] }}", codegen=codegen)
+        context = CompoundContext({"r": range(4000)})
+        for _ in range(3):
+            assert tpl.render(context=context) == "3999"
+
+
+class TestCompactNodes:
+
+    def nodes(self, node):
+        yield node
+        for child in getattr(node, "nodes", ()):
+            yield from self.nodes(child)
+
+    def test_slots(self):
+        tpl = Template("{% for i in j %}{% if i %}{{ i }}{% else %}-"
+                       "{% endif %}{# c #}{% endfor %}", optimize=False)
+        for node in self.nodes(tpl.mainnode):
+            assert not hasattr(node, "__dict__")
+        assert not hasattr(tpl.mainnode.nodes[0].compiled, "__dict__")
+
+    def test_code_span(self):
+        code = "a {% for i in j %}{% if i %}x{% endif %}{% endfor %} b"
+        for_node = Template(code).mainnode.nodes[1]
+        assert (for_node.offset, for_node.end) == (2, 52)
+        assert for_node.code == code[2:52]
+        assert for_node.nodes[0].code == "{% if i %}x{% endif %}"
+        assert for_node.lines.source is code
+
+    def test_no_code(self):
+        assert Template("{{ a }}").mainnode.nodes[0].code == ""
+
+    def test_code_set(self, monkeypatch):
+        """ custom tags can set the code they render """
+        class NowNode(StatementNode):
+            def __init__(self, type, expression="", parent=None):
+                super().__init__(type, expression, parent=parent)
+                self.code = "NOW"
+
+        monkeypatch.setitem(registry._tags, "now",
+                            [(NowNode, MainNode, False)])
+        assert Template("[{% now %}]").render() == "[NOW]"
+
+    def test_parent_cleared(self):
+        tpl = Template("{% for i in j %}{% if i %}{{ i }}{% endif %}"
+                       "{% endfor %}")
+        for node in self.nodes(tpl.mainnode):
+            assert node.parent is None
@@ -0,0 +1,125 @@
+import ast
+
+import pytest
+import simpleeval
+
+from ate.ate import Template, Context
+
+
+def render(tpl, **data):
+    """ the output, or the type and message of the error raised """
+    try:
+        return tpl.render(**data)
+    except Exception as e:
+        return type(e), str(e)
+
+
+def both(code, **data):
+    """ render code using both the interpreter and generated code """
+    return (render(Template(code), **data),
+            render(Template(code, codegen=True), **data))
+
+
+class Obj:
+    x = 42
+
+
+class TestCodegen:
+
+    @pytest.mark.parametrize("code", [
+        "",
+        "Hello World",
+        "{{i}}",
+        "{{ i + j * 2 }}",
+        "{{ -i }}",
+        "{{ 'a' + 'b' }}",
+        "{{ '}}' }}",
+        "{{ d.x }} {{ d['y'] }} {{ o.x }}",
+        "{{ s[1:] }} {{ s[::2] }} {{ s[0] }}",
+        "{{ 1 if i else 2 }}",
+        "{{ i == 10 }} {{ i < j }}",
+        "{# comment #}text",
+        "{%for i in s%}{{i}}{%endfor%}",
+        "{%for i in s%}{{loop.index}}{{loop.first}}{{loop.last}}{%endfor%}",
+        "{%for x in s%}{%for y in s%}{{x}}{{y}}{%endfor%}{%endfor%}",
+        "{%if i%}yes{%endif%}",
+        "{%if i > 100%}yes{%else%}no{%endif%}",
+        "{%if i%}{%else%}{%endif%}",
+        "{{ d.nonexisting }}",
+        "{{ d.keys }}",
+        "{{ s.format }}",
+        "{{ s.func_x }} {{ o.__class__ }}",
+        "{{ i + s }}",
+    ])
+    def test_same_as_interpreter(self, code):
+        interpreted, generated = both(code, i=10, j=3, s="abc", o=Obj(),
+                                      d=dict(x=1, y=2, keys=3))
+        assert interpreted == generated
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_eval_overridden(self, codegen):
+        """ a context overriding eval() gets every expression """
+        class LenientContext(Context):
+            def eval(self, expr, strict=False):
+                try:
+                    return super().eval(expr, strict)
+                except NameError:
+                    return ""
+
+        tpl = Template("[{{ missing }}]{%for i in s%}{{i}}{%endfor%}",
+                       codegen=codegen)
+        assert tpl.render(context_class=LenientContext, s="ab") == "[]ab"
+        assert list(tpl.render_batch([{"s": "c"}],
+                                     context_class=LenientContext)) == \
+            ["[]c"]
+
+    @pytest.mark.parametrize("code", ["{{ a * 2 }}", "{{ -a }}",
+                                      "{{ a < 2 }}"])
+    def test_undefined_operator(self, code):
+        """ operators the evaluator doesn't have fail like they do in
+            the interpreter """
+        class LimitedEval(simpleeval.SimpleEval):
+            def __init__(self, *args, **kw):
+                super().__init__(*args, **kw)
+                for op in (ast.Mult, ast.USub, ast.Lt):
+                    del self.operators[op]
+
+        class LimitedContext(Context):
+            evaluator_class = LimitedEval
+
+        tpl = Template("{{ a + 1 }}" + code, optimize=False)
+        assert render(tpl, a=1, context_class=LimitedContext) == \
+            render(Template(tpl.code, codegen=True, optimize=False), a=1,
+                   context_class=LimitedContext)
+
+    def test_source(self):
+        tpl = Template("{%for i in s%}{{i}}{%endfor%}", codegen=True)
+        assert "for " in tpl.generate_function.source
+
+    def test_context_stacking(self):
+        tpl = Template("{%for i in j%}{{i}}{%endfor%}{{i}}", codegen=True)
+        assert tpl.render(i="z", j=["a"]) == "az"
+
+    def test_slot_fallback(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER", codegen=True)
+        final = Template("{%for i in '12'%}{{i}}{%endfor%}", parent=base,
+                         codegen=True)
+        assert final.render() == "HEAD 12 FOOTER"
+        assert base.render() == "HEAD xxx FOOTER"
+
+    def test_fill(self):
+        base = Template("HEAD {%slot a%}{%endslot%} {%slot b%}{%endslot%}")
+        final = Template("{%fill a%}A{{i}}{%endfill%}"
+                         "{%fill b%}B{%endfill%}", parent=base, codegen=True)
+        assert final.render(i=1) == "HEAD A1 B"
+
+    def test_underscore_attribute(self):
+        """ delegated to the evaluator, which decides what's allowed """
+        code = "{{ o.__class__ }}"
+        try:
+            expected = Template(code).render(o=Obj())
+        except Exception as e:
+            with pytest.raises(e.__class__):
+                Template(code, codegen=True).render(o=Obj())
+        else:
+            assert Template(code, codegen=True).render(o=Obj()) == expected
@@ -1,4 +1,4 @@
-from ate.ate import Template
+from ate.ate import Template, Context
 
 
 class TestInheritance:
@@ -130,3 +130,25 @@ class TestInheritance:
         tpl = "1\n\n{% slot %}hello{%endslot%}"
         res = Template(tpl).render()
         assert res == "1\n\nhello"
+
+    def test_fills_index(self):
+        tpl = Template("{%fill a%}A{%endfill%}noise{%fill b%}B{%endfill%}"
+                       "{%fill a%}second{%endfill%}")
+        fills = tpl.mainnode.fills
+        assert sorted(fills) == ["a", "b"]
+        assert fills["a"].nodes[0].text == "A"
+
+    def test_chain(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER")
+        first = Template("body {% slot %}{% endslot %}", parent=base)
+        second = Template("The end", parent=first)
+        assert second.chain() == (base, first, second)
+        assert second.chain() is second.chain()
+
+    def test_children_restored(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER")
+        final = Template("body", parent=base)
+        context = Context({})
+        assert final.render(context=context) == "HEAD body FOOTER"
+        assert context.children == []
+        assert final.render(context=context) == "HEAD body FOOTER"
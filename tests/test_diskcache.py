@@ -0,0 +1,71 @@
+import pytest
+
+from ate.ate import Template
+from ate.diskcache import DiskCache
+from ate.loader import Loader
+from ate.tags import MainNode
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path / "cache"))
+
+
+CODE = ("HEAD {% for i in seq %}{% if i %}{{ i * 2 }}{% else %}-{% endif %}"
+        "{% endfor %}{# comment #} {%slot%}{%endslot%}")
+
+
+class TestDiskCache:
+
+    def test_miss(self, cache):
+        assert cache.load(CODE) is None
+
+    def test_store(self, cache):
+        Template(CODE, compile_cache=cache)
+        assert isinstance(cache.load(CODE), MainNode)
+
+    def test_cached(self, cache, monkeypatch):
+        Template(CODE, compile_cache=cache)
+
+        def fail(*args, **kw):
+            raise AssertionError("template was parsed")
+
+        monkeypatch.setattr(MainNode, "compile", fail)
+        tpl = Template(CODE, compile_cache=cache)
+        assert tpl.render(seq=[0, 1, 2]) == "HEAD -24 "
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_render(self, cache, codegen):
+        Template(CODE, compile_cache=cache)
+        tpl = Template(CODE, compile_cache=cache, codegen=codegen)
+        assert tpl.render(seq=[0, 1, 2]) == "HEAD -24 "
+
+    def test_options(self, cache):
+        code = "{% if 1 %}\n  a\n{% endif %}\n"
+        Template(code, compile_cache=cache)
+        assert cache.load(code, ("trim_blocks",)) is None
+        tpl = Template(code, compile_cache=cache, trim_blocks=True)
+        assert tpl.render() == "  a\n"
+        assert cache.load(code, ("trim_blocks",)) is not None
+
+    def test_version(self, cache, monkeypatch):
+        Template(CODE, compile_cache=cache)
+        monkeypatch.setattr("ate.diskcache.__version__", "999")
+        assert cache.load(CODE) is None
+
+    def test_corrupt(self, cache):
+        with open(cache.filename(CODE), "wb") as f:
+            f.write(b"garbage")
+        tpl = Template(CODE, compile_cache=cache)
+        assert tpl.render(seq=[1]) == "HEAD 2 "
+        assert cache.load(CODE) is not None
+
+    def test_clear(self, cache):
+        Template(CODE, compile_cache=cache)
+        cache.clear()
+        assert cache.load(CODE) is None
+
+    def test_loader(self, cache, tmp_path):
+        (tmp_path / "hello.html").write_text("Hello {{name}}")
+        Loader(str(tmp_path), compile_cache=cache).load("hello.html")
+        assert cache.load("Hello {{name}}") is not None
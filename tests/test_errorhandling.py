@@ -1,8 +1,11 @@
+import pickle
+
 import pytest
+import simpleeval
 
 from ate.tags import CompileStatement
-from ate.ate import ParseContext, Template
-from ate.exceptions import ParseError
+from ate.ate import ParseContext, Template, Context
+from ate.exceptions import ParseError, EvaluationError
 
 
 class TestErrorHandling:
@@ -78,3 +81,75 @@ more noise
         That's all!"""
         t = Template(tpl)
         t.render(abc="123")
+
+
+class TestRuntimeErrors:
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_location(self, codegen):
+        tpl = Template("Hello\n  {% for i in s %}\n{{ i + x }}{% endfor %}",
+                       codegen=codegen)
+        with pytest.raises(EvaluationError) as e:
+            tpl.render(s=[1])
+
+        exc = e.value
+        assert exc.expression.position() == (3, 1)
+        assert "line 3, column 1" in str(exc)
+        assert isinstance(exc.__cause__, NameError)
+        # still a NameError, as before expressions were wrapped
+        assert isinstance(exc, NameError)
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_simpleeval_error(self, codegen):
+        tpl = Template("{{ s.format }}", codegen=codegen)
+        with pytest.raises(EvaluationError) as e:
+            tpl.render(s="x")
+        assert "FeatureNotAvailable" in str(e.value)
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    @pytest.mark.parametrize("code, error", [
+        ("{{ foo() }}", simpleeval.FunctionNotDefined),
+        ("{{ a.__class__ }}", simpleeval.FeatureNotAvailable),
+        ("{{ s.format }}", simpleeval.FeatureNotAvailable),
+    ])
+    def test_simpleeval_errors_caught(self, codegen, code, error):
+        """ the original simpleeval errors still catch what's raised """
+        tpl = Template(code, codegen=codegen)
+        with pytest.raises(simpleeval.InvalidExpression) as e:
+            tpl.render(a=1, s="x")
+        assert isinstance(e.value, error)
+        assert isinstance(e.value, EvaluationError)
+        assert "line 1, column 1" in str(e.value)
+
+    def test_pickle(self):
+        tpl = Template("{{ foo() }}")
+        with pytest.raises(EvaluationError) as e:
+            tpl.render()
+        copy = pickle.loads(pickle.dumps(e.value))
+        assert isinstance(copy, simpleeval.FunctionNotDefined)
+        assert str(copy) == str(e.value)
+        assert copy.func_name == "foo"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_other_errors_passed_on(self, codegen):
+        """ errors not caused by the expression itself are not wrapped """
+        def fail():
+            raise KeyError("nope")
+
+        class FailingContext(Context):
+            functions = {"fail": fail}
+
+        for code, data in (("{{ 1 / i }}", {"i": 0}), ("{{ fail() }}", {})):
+            tpl = Template(code, codegen=codegen,
+                           context_class=FailingContext)
+            with pytest.raises((ZeroDivisionError, KeyError)) as e:
+                tpl.render(**data)
+            assert not isinstance(e.value, EvaluationError)
+
+    def test_node_position(self):
+        tpl = Template("a\n {{ b }}\n{% if c %}d{% endif %}")
+        text, expression, _, block = tpl.mainnode.nodes
+        assert text.position() == (1, 1)
+        assert expression.position() == (2, 2)
+        assert block.position() == (3, 1)
+        assert block.nodes[0].position() == (3, 11)
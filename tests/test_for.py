@@ -1,4 +1,7 @@
+import pytest
+
 from ate.ate import Template
+from ate.tags import ForBlockStatementNode
 
 
 class TestForBlock:
@@ -22,3 +25,56 @@ class TestForBlock:
                        )
         res = tpl.render(seq="abcde")
         assert res == "a is firsta0-1b1-2c2-3d3-4e is laste4-5"
+
+    def test_shadowing(self):
+        tpl = Template("{%for i in a%}{%for i in b%}{{i}}{%endfor%}{{i}}"
+                       "{%endfor%}{{i}}")
+        assert tpl.render(i="z", a="12", b="xy") == "xy1xy2z"
+
+    def test_outer_variable(self):
+        tpl = Template("{%for i in a%}{%for j in b%}{%for k in c%}"
+                       "{{i}}{{j}}{{k}}{{x}}"
+                       "{%endfor%}{%endfor%}{%endfor%}")
+        assert tpl.render(a="1", b="2", c="34", x=".") == "123.124."
+
+    def test_empty(self):
+        tpl = Template("{%for i in j%}{{i}}{%endfor%}{{i}}")
+        assert tpl.render(i="z", j=[]) == "z"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_generator(self, codegen):
+        tpl = Template("{%for i in seq%}{{i}}{%if loop.last%}!{%endif%}"
+                       "{%endfor%}", codegen=codegen)
+        assert tpl.render(seq=(i * 2 for i in range(4))) == "0246!"
+
+    def test_single(self):
+        tpl = Template("{%for i in seq%}{{loop.first}}{{loop.last}}"
+                       "{%endfor%}")
+        assert tpl.render(seq=[1]) == "TrueTrue"
+
+    def test_lazy(self):
+        """ only one element is read ahead """
+        consumed = []
+
+        def seq():
+            for i in range(3):
+                consumed.append(i)
+                yield i
+
+        tpl = Template("{%for i in seq%}{{i}}{%endfor%}")
+        chunks = tpl.generate(seq=seq())
+        assert next(chunks) == "0"
+        assert consumed == [0, 1]
+
+
+class TestLoop:
+
+    def test_reused(self):
+        node = ForBlockStatementNode("for")
+        loops = [loop for loop, element in node.looper("abc")]
+        assert loops[0] is loops[2]
+
+    def test_repr(self):
+        node = ForBlockStatementNode("for")
+        loop, element = next(node.looper("a"))
+        assert repr(loop) == "Loop(index=0, index0=1, first=True, last=True)"
@@ -0,0 +1,165 @@
+import pytest
+
+from ate.ate import Template, Context
+from ate.exceptions import EvaluationError
+from ate.fragmentcache import MemoryFragmentCache, DiskFragmentCache
+from ate.tags import CacheBlockStatementNode
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def memory():
+    cache = MemoryFragmentCache(size=2)
+    cache.clock = Clock()
+    return cache
+
+
+@pytest.fixture
+def disk(tmp_path):
+    cache = DiskFragmentCache(str(tmp_path / "fragments"))
+    cache.clock = Clock()
+    return cache
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request):
+    return request.getfixturevalue(request.param)
+
+
+def context_class(cache):
+    class CachingContext(Context):
+        fragment_cache = cache
+    return CachingContext
+
+
+class TestBackends:
+
+    def test_miss(self, cache):
+        assert cache.get("a") is None
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_hit(self, cache):
+        cache.set("a", "fragment\r\n")
+        assert cache.get("a") == "fragment\r\n"
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_empty(self, cache):
+        cache.set("a", "")
+        assert cache.get("a") == ""
+
+    def test_ttl(self, cache):
+        cache.set("a", "fragment", 10)
+        cache.clock.now += 9
+        assert cache.get("a") == "fragment"
+        cache.clock.now += 1
+        assert cache.get("a") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_no_ttl(self, cache):
+        cache.set("a", "x", 0)
+        assert cache.get("a") is None
+
+    def test_clear(self, cache):
+        cache.set("a", "x")
+        cache.clear()
+        assert cache.get("a") is None
+
+    def test_lru(self, memory):
+        memory.set("a", "a")
+        memory.set("b", "b")
+        memory.get("a")
+        memory.set("c", "c")  # evicts b, the least recently used
+        assert memory.get("b") is None
+        assert memory.get("a") == "a"
+
+    def test_shared(self, disk):
+        disk.set(("user", 1), "x")
+        other = DiskFragmentCache(disk.directory)
+        assert other.get(("user", 1)) == "x"
+
+
+class TestCacheTag:
+
+    def test_parse(self):
+        node = Template("{% cache 'menu' + user 60 %}x{% endcache %}",
+                        optimize=False).mainnode.nodes[0]
+        assert isinstance(node, CacheBlockStatementNode)
+        assert node.key.source == "'menu' + user"
+        assert node.ttl.source == "60"
+
+    @pytest.mark.parametrize("code", ["{% cache 'side bar' %}{% endcache %}",
+                                      "{% cache a + b %}{% endcache %}",
+                                      "{% cache key %}{% endcache %}"])
+    def test_parse_key_only(self, code):
+        node = Template(code).mainnode.nodes[0]
+        assert node.ttl is None
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_cached(self, cache, codegen):
+        tpl = Template("[{% cache 'k' %}{{ value }}{% endcache %}]",
+                       context_class=context_class(cache), codegen=codegen)
+        assert tpl.render(value=1) == "[1]"
+        assert tpl.render(value=2) == "[1]"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key(self, cache):
+        tpl = Template("{% cache 'menu' + user %}{{ user }}{% endcache %}",
+                       context_class=context_class(cache))
+        assert tpl.render(user="a") == "a"
+        assert tpl.render(user="b") == "b"
+        assert tpl.render(user="a") == "a"
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_ttl(self, cache):
+        tpl = Template("{% cache 'k' ttl %}{{ value }}{% endcache %}",
+                       context_class=context_class(cache))
+        assert tpl.render(value=1, ttl=10) == "1"
+        cache.clock.now += 10
+        assert tpl.render(value=2, ttl=10) == "2"
+
+    def test_loop(self, memory):
+        tpl = Template("{% for i in j %}{% cache i %}{{ i * 2 }}"
+                       "{% endcache %}{% endfor %}",
+                       context_class=context_class(memory))
+        assert tpl.render(j=[1, 2, 1]) == "242"
+        assert (memory.hits, memory.misses) == (1, 2)
+
+    def test_missing_attribute(self, memory):
+        """ a key that can't be evaluated is an error, it's not cached
+            under a placeholder shared by all renders """
+        tpl = Template("{% cache user.id %}{{ user }}{% endcache %}",
+                       context_class=context_class(memory))
+        with pytest.raises(EvaluationError):
+            tpl.render(user="a")
+        assert not memory.fragments
+
+    @pytest.mark.parametrize("ttl", ["'10'", "True", "ttl+'x'", "ttl.nope"])
+    def test_invalid_ttl(self, memory, ttl):
+        tpl = Template("{{% cache 'k' {} %}}x{{% endcache %}}".format(ttl),
+                       context_class=context_class(memory))
+        with pytest.raises(EvaluationError):
+            tpl.render(ttl=10)
+        assert not memory.fragments
+
+    def test_unhashable_key(self, memory):
+        tpl = Template("{% cache k %}x{% endcache %}",
+                       context_class=context_class(memory))
+        with pytest.raises(EvaluationError):
+            tpl.render(k=[1])
+
+    def test_templates(self, cache):
+        """ the same key in different templates is a different fragment """
+        caching = context_class(cache)
+        menu = Template("{% cache 'k' %}menu{% endcache %}",
+                        context_class=caching)
+        footer = Template("{% cache 'k' %}footer{% endcache %}",
+                          context_class=caching)
+        assert menu.render() == "menu"
+        assert footer.render() == "footer"
+        assert menu.render() == "menu"
@@ -0,0 +1,97 @@
+import io
+
+import pytest
+
+from ate.ate import Template
+from ate.exceptions import EvaluationError
+
+
+class TestGenerate:
+
+    def test_simple(self):
+        tpl = Template("Hello {{name}}!")
+        assert list(tpl.generate(name="World")) == ["Hello ", "World", "!"]
+
+    def test_render_to(self):
+        tpl = Template("{%for i in j%}{{i}}{%if loop.last%}.{%endif%}"
+                       "{%endfor%}")
+        out = io.StringIO()
+        tpl.render_to(out, j=[1, 2, 3])
+        assert out.getvalue() == "123."
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_streaming(self, codegen):
+        """ output is available before the sequence is exhausted """
+        def seq():
+            yield 1
+            raise AssertionError("not streaming")
+
+        tpl = Template("start {%for i in s%}{{i}}{%endfor%}", codegen=codegen)
+        chunks = tpl.generate(s=seq())
+        assert next(chunks) == "start "
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_inheritance(self, codegen):
+        base = Template("HEAD {%slot a%} aa {% endslot %}"
+                        "{%for i in '123'%}"
+                        "{%slot b %}{%endslot%}"
+                        "{%endfor%}"
+                        "FOOTER")
+        c1 = Template("{%fill a%}A{%endfill%}"
+                      "noise"
+                      "{%fill b%}"
+                      "{{i}}{%slot c%}..{%endslot%}"
+                      "{%endfill%}",
+                      parent=base, codegen=codegen)
+        c2 = Template("Default", parent=c1, codegen=codegen)
+
+        assert "".join(c2.generate()) == c2.render()
+        assert "".join(c2.generate()) == \
+            "HEAD A1Default2Default3DefaultFOOTER"
+
+    def test_no_child(self):
+        tpl = Template("1\n\n{% slot %}hello{%endslot%}")
+        assert "".join(tpl.generate()) == "1\n\nhello"
+
+
+class TestRenderBatch:
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_batch(self, codegen):
+        tpl = Template("Hello {{name}}{%for i in j%} {{i}}{%endfor%}!",
+                       codegen=codegen)
+        items = [{"name": "a", "j": [1, 2]}, {"name": "b", "j": []}]
+        assert list(tpl.render_batch(items)) == ["Hello a 1 2!", "Hello b!"]
+
+    def test_one_context(self):
+        contexts = []
+
+        class Context(Template.context_class):
+            def __init__(self, *args, **kw):
+                super().__init__(*args, **kw)
+                contexts.append(self)
+
+        tpl = Template("{{i}}")
+        assert list(tpl.render_batch(({"i": i} for i in range(3)),
+                                     context_class=Context)) == \
+            ["0", "1", "2"]
+        assert len(contexts) == 1
+
+    def test_scopes_reset(self):
+        """ names of one item are not visible to the next """
+        tpl = Template("{{b}}")
+        results = tpl.render_batch([{"b": 1}, {}])
+        assert next(results) == "1"
+        with pytest.raises(EvaluationError):
+            next(results)
+
+    def test_static(self):
+        tpl = Template("Hello{# comment #} World")
+        assert tpl.mainnode.segments() == ["Hello World"]
+        assert list(tpl.render_batch([{}, {"a": 1}])) == ["Hello World"] * 2
+
+    def test_inheritance(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER")
+        child = Template("{{i}}", parent=base)
+        assert list(child.render_batch([{"i": 1}, {"i": 2}])) == \
+            ["HEAD 1 FOOTER", "HEAD 2 FOOTER"]
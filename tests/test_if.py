@@ -22,3 +22,48 @@ class TestIfBlock:
         with pytest.raises(ParseError) as e:
             Template("{%else%}").render()
         assert e.value.pc.tag == 'else'
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_elif(self, codegen):
+        tpl = Template("{%if i == 1%}one{%elif i == 2%}two"
+                       "{%elif i == 3%}three{%else%}many{%endif%}",
+                       codegen=codegen)
+        assert tpl.render(i=1) == "one"
+        assert tpl.render(i=2) == "two"
+        assert tpl.render(i=3) == "three"
+        assert tpl.render(i=4) == "many"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_elif_no_else(self, codegen):
+        tpl = Template("{%if i == 1%}one{%elif i == 2%}two{%endif%}",
+                       codegen=codegen)
+        assert tpl.render(i=2) == "two"
+        assert tpl.render(i=3) == ""
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_elif_lazy(self, codegen):
+        """ conditions after the matching one are not evaluated """
+        tpl = Template("{%if a%}A{%elif missing%}B{%endif%}",
+                       codegen=codegen)
+        assert tpl.render(a=True) == "A"
+
+    def test_branches(self):
+        tpl = Template("{%if a%}A{%elif b%}B{%else%}C{%endif%}")
+        node = tpl.mainnode.nodes[0]
+        assert len(node.branches) == 2
+        assert node.branches[0][0] is node
+        assert node.branches[1][0].expression == "b"
+        assert node.orelse[0].text == "C"
+
+    def test_elif_after_else(self):
+        with pytest.raises(ParseError):
+            Template("{%if a%}A{%else%}B{%elif c%}C{%endif%}")
+
+    def test_double_else(self):
+        with pytest.raises(ParseError):
+            Template("{%if a%}A{%else%}B{%else%}C{%endif%}")
+
+    def test_toplevel_elif(self):
+        with pytest.raises(ParseError) as e:
+            Template("{%elif a%}")
+        assert e.value.pc.tag == 'elif'
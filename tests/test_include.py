@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+from ate.ate import Template
+from ate.exceptions import ParseError
+from ate.loader import Loader
+
+
+@pytest.fixture
+def templates(tmp_path):
+    def write(name, code):
+        path = tmp_path / name
+        path.write_text(code)
+        return str(path)
+    write.loader = Loader(str(tmp_path))
+    return write
+
+
+class TestInclude:
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_include(self, templates, codegen):
+        templates("menu.html", "<{{ item }}>")
+        templates("page.html", "[{% include 'menu.html' %}]")
+        loader = Loader(templates.loader.paths, codegen=codegen)
+        assert loader.load("page.html").render(item="a") == "[<a>]"
+
+    def test_loop(self, templates):
+        templates("item.html", "{{ i }}{% if loop.last %}.{% endif %}")
+        templates("page.html",
+                  "{% for i in j %}{% include \"item.html\" %}{% endfor %}")
+        page = templates.loader.load("page.html")
+        assert page.render(j=[1, 2]) == "12."
+
+    def test_streaming(self, templates):
+        templates("part.html", "a{{ b }}c")
+        templates("page.html", "<{% include 'part.html' %}>")
+        page = templates.loader.load("page.html")
+        assert list(page.generate(b=1)) == ["<", "a", "1", "c", ">"]
+
+    def test_compiled_once(self, templates):
+        templates("part.html", "part")
+        templates("a.html", "{% include 'part.html' %}")
+        templates("b.html", "{% include 'part.html' %}")
+        loader = templates.loader
+        loader.load("a.html")
+        part = loader.load("part.html")
+        loader.load("b.html")
+        assert loader.load("part.html") is part
+
+    def test_reload(self, templates):
+        filename = templates("part.html", "old")
+        templates("page.html", "{% include 'part.html' %}")
+        page = templates.loader.load("page.html")
+        assert page.render() == "old"
+
+        templates("part.html", "new")
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        assert page.render() == "new"
+
+    def test_includes(self, templates):
+        templates("c.html", "c")
+        templates("b.html", "{% include 'c.html' %}")
+        templates("a.html", "{% include 'b.html' %}")
+        a = templates.loader.load("a.html")
+        assert a.mainnode.includes == {"b.html", "c.html"}
+
+    def test_in_child(self, templates):
+        templates("base.html", "HEAD {% slot %}{% endslot %} FOOTER")
+        templates("part.html", "[{% slot %}default{% endslot %}]")
+        templates("page.html", "{% include 'part.html' %}")
+        page = templates.loader.load("page.html", parent="base.html")
+        assert page.render() == "HEAD [default] FOOTER"
+
+
+class TestIncludeErrors:
+
+    def test_not_found(self, templates):
+        templates("page.html", "{% include 'missing.html' %}")
+        with pytest.raises(ParseError) as e:
+            templates.loader.load("page.html")
+        assert str(e.value) == "Included template not found"
+
+    def test_name(self, templates):
+        templates("page.html", "{% include name %}")
+        with pytest.raises(ParseError):
+            templates.loader.load("page.html")
+
+    def test_no_loader(self):
+        with pytest.raises(ParseError):
+            Template("{% include 'x.html' %}")
+
+    def test_self(self, templates):
+        templates("a.html", "{% include 'a.html' %}")
+        with pytest.raises(ParseError) as e:
+            templates.loader.load("a.html")
+        assert str(e.value) == "Include cycle: a.html -> a.html"
+
+    def test_cycle(self, templates):
+        templates("a.html", "{% include 'b.html' %}")
+        templates("b.html", "{% include 'c.html' %}")
+        templates("c.html", "{% include 'a.html' %}")
+        with pytest.raises(ParseError) as e:
+            templates.loader.load("a.html")
+        assert "a.html -> b.html -> c.html -> a.html" in str(e.value)
+        assert templates.loader.compiling() == []
+
+    def test_cycle_after_change(self, templates):
+        """ a template compiled before is changed to include its
+            includer """
+        templates("a.html", "{% include 'b.html' %}")
+        filename = templates("b.html", "b")
+        loader = templates.loader
+        loader.load("a.html")
+
+        templates("b.html", "{% include 'a.html' %}")
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        with pytest.raises(ParseError):
+            loader.load("b.html")
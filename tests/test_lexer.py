@@ -0,0 +1,144 @@
+import pytest
+
+from ate.exceptions import ExpressionNotClosed
+from ate.lexer import tokenize, scan, markers, Lexer, LineIndex
+from ate.lexer import TEXT, EXPRESSION, STATEMENT, COMMENT
+
+
+def kinds(source):
+    return [(kind, source[start:end]) for kind, start, end
+            in tokenize(source)]
+
+
+class TestTokenize:
+
+    def test_empty(self):
+        assert tokenize("") == []
+
+    def test_text(self):
+        assert kinds("Hello World") == [(TEXT, "Hello World")]
+
+    def test_tags(self):
+        assert kinds("a{{b}}c{%if x%}d{#e#}") == [
+            (TEXT, "a"), (EXPRESSION, "{{b}}"), (TEXT, "c"),
+            (STATEMENT, "{%if x%}"), (TEXT, "d"), (COMMENT, "{#e#}")]
+
+    def test_markers_in_strings(self):
+        assert kinds("{{'}}'}}{% if '%}' %}") == [
+            (EXPRESSION, "{{'}}'}}"), (STATEMENT, "{% if '%}' %}")]
+
+    def test_escape_in_string(self):
+        assert kinds(r"{{'\'}}'}}x") == [
+            (EXPRESSION, r"{{'\'}}'}}"), (TEXT, "x")]
+
+    def test_comment_hides_tags(self):
+        assert kinds("{# {% for #}x") == [
+            (COMMENT, "{# {% for #}"), (TEXT, "x")]
+
+    def test_accolades(self):
+        assert kinds("if {} { {! x }} {=") == [(TEXT, "if {} { {! x }} {=")]
+
+    def test_unclosed(self):
+        assert tokenize("abc {{ 1 }} {% if") == [
+            (TEXT, 0, 4), (EXPRESSION, 4, 11), (TEXT, 11, 12),
+            (STATEMENT, 12, None)]
+
+    def test_unclosed_string(self):
+        assert tokenize("{{ 'abc }}") == [(EXPRESSION, 0, None)]
+
+
+class TestLexer:
+
+    def test_find(self):
+        lexer = Lexer("ab{{c}}de")
+        assert lexer.find(0) == 0
+        assert lexer.find(1) == 0
+        assert lexer.find(2) == 1
+        assert lexer.find(7) == 2
+        assert lexer.find(9) == 3
+
+
+class TestLineIndex:
+
+    def test_position(self):
+        lines = LineIndex("ab\ncd\n\nef")
+        assert lines.position(0) == (1, 1)
+        assert lines.position(1) == (1, 2)
+        assert lines.position(2) == (1, 3)
+        assert lines.position(3) == (2, 1)
+        assert lines.position(6) == (3, 1)
+        assert lines.position(8) == (4, 2)
+
+    def test_no_newlines(self):
+        assert LineIndex("abc").position(2) == (1, 3)
+
+
+class TestScan:
+
+    def test_simple(self):
+        assert scan("{{ a }} b", 2, "}}") == 7
+
+    def test_offset(self):
+        assert scan("xx{% if a %}", 4, "%}") == 12
+
+    def test_string(self):
+        assert scan("{# '#}' #}", 2, "#}") == 10
+
+    def test_multiline(self):
+        assert scan("{% if\n'a\nb' %}", 2, "%}") == 14
+
+    def test_not_closed(self):
+        with pytest.raises(ExpressionNotClosed):
+            scan("{{ 'a }}", 2, "}}")
+
+
+class TestMarkers:
+
+    def body(self, source):
+        kind, start, end = tokenize(source)[0]
+        start, end, before, after = markers(source, kind, start, end)
+        return source[start:end], before, after
+
+    def test_none(self):
+        assert self.body("{% if x %}") == (" if x ", False, False)
+
+    def test_statement(self):
+        assert self.body("{%- if x -%}") == (" if x ", True, True)
+        assert self.body("{%-if x-%}") == ("if x", True, True)
+
+    def test_comment(self):
+        assert self.body("{#- x #}") == (" x ", True, False)
+
+    def test_expression(self):
+        assert self.body("{{- x -}}") == (" x ", True, True)
+        assert self.body("{{ x -}}") == (" x ", False, True)
+
+    def test_negative(self):
+        assert self.body("{{-1}}") == ("-1", False, False)
+        assert self.body("{{ 2 - -1 }}") == (" 2 - -1 ", False, False)
+
+
+class TestText:
+
+    def text(self, source, trim_blocks=False):
+        lexer = Lexer(source)
+        res = []
+        for i, (kind, _, _) in enumerate(lexer.tokens):
+            if kind == TEXT:
+                start, end = lexer.text(i, trim_blocks)
+                res.append(source[start:end])
+        return res
+
+    def test_markers(self):
+        assert self.text("a  {{- x -}}\n b") == ["a", "b"]
+
+    def test_trim_blocks(self):
+        assert self.text("a\n  {% if x %}\n  b\n  {% endif %}\nc",
+                         trim_blocks=True) == ["a\n", "  b\n", "c"]
+
+    def test_trim_blocks_inline(self):
+        """ only whitespace at the start of a line is removed """
+        assert self.text("a {% if x %} b", trim_blocks=True) == ["a ", " b"]
+
+    def test_trim_blocks_expression(self):
+        assert self.text("{{ x }}\n", trim_blocks=True) == ["\n"]
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from ate.loader import Loader
+from ate.exceptions import TemplateNotFound
+
+
+@pytest.fixture
+def templates(tmp_path):
+    def write(name, code):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(code)
+        return str(path)
+    write.path = str(tmp_path)
+    return write
+
+
+class TestLoader:
+
+    def test_load(self, templates):
+        templates("hello.html", "Hello {{name}}")
+        loader = Loader(templates.path)
+        assert loader.load("hello.html").render(name="World") == \
+            "Hello World"
+
+    def test_subdirectory(self, templates):
+        templates("sub/hello.html", "Hello")
+        loader = Loader(templates.path)
+        assert loader.load("sub/hello.html").render() == "Hello"
+
+    def test_search_paths(self, templates, tmp_path):
+        templates("a/hello.html", "A")
+        templates("b/hello.html", "B")
+        templates("b/other.html", "other")
+        loader = Loader([str(tmp_path / "a"), str(tmp_path / "b")])
+        assert loader.load("hello.html").render() == "A"
+        assert loader.load("other.html").render() == "other"
+
+    def test_not_found(self, templates):
+        loader = Loader(templates.path)
+        with pytest.raises(TemplateNotFound):
+            loader.load("nonexisting.html")
+
+    def test_outside_path(self, templates, tmp_path):
+        templates("secret.html", "secret")
+        loader = Loader(str(tmp_path / "templates"))
+        with pytest.raises(TemplateNotFound):
+            loader.load("../secret.html")
+
+    def test_cached(self, templates):
+        templates("hello.html", "Hello")
+        loader = Loader(templates.path)
+        assert loader.load("hello.html") is loader.load("hello.html")
+
+    def test_reload(self, templates):
+        filename = templates("hello.html", "Hello")
+        loader = Loader(templates.path)
+        first = loader.load("hello.html")
+
+        templates("hello.html", "Goodbye")
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+        second = loader.load("hello.html")
+        assert second is not first
+        assert second.render() == "Goodbye"
+
+    def test_lru(self, templates):
+        for name in "abc":
+            templates(name, name)
+        loader = Loader(templates.path, size=2)
+        a = loader.load("a")
+        loader.load("b")
+        loader.load("a")
+        loader.load("c")  # evicts b, the least recently used
+
+        assert len(loader.cache) == 2
+        assert ("b", None) not in loader.cache
+        assert loader.load("a") is a
+
+    def test_parent(self, templates):
+        templates("base.html", "HEAD {%slot%}xxx{%endslot%} FOOTER")
+        templates("page.html", "body")
+        loader = Loader(templates.path)
+        page = loader.load("page.html", parent="base.html")
+        assert page.render() == "HEAD body FOOTER"
+        assert page.get_parent() is loader.load("base.html")
+
+    def test_parent_chain(self, templates):
+        templates("base.html", "HEAD {%slot%}xxx{%endslot%} FOOTER")
+        templates("first.html", "This is the body {% slot %}{% endslot %}")
+        templates("second.html", "The end...")
+        loader = Loader(templates.path)
+        second = loader.load("second.html",
+                             parent=("first.html", "base.html"))
+        assert second.render() == "HEAD This is the body The end... FOOTER"
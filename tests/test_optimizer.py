@@ -0,0 +1,143 @@
+import ast
+
+import pytest
+import simpleeval
+
+from ate.ate import Template, Context
+from ate.diskcache import DiskCache
+from ate.optimizer import optimize
+from ate.tags import TextNode, ExpressionNode, IfBlockStatementNode
+
+
+def nodes(code):
+    return Template(code).mainnode.nodes
+
+
+class ConcatEval(simpleeval.SimpleEval):
+    """ + shows its operands instead of adding them """
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.operators[ast.Add] = "{}+{}".format
+
+
+class ConcatContext(Context):
+    evaluator_class = ConcatEval
+
+
+class TestOptimizer:
+
+    def test_merge_text(self):
+        res = nodes("Hello{# comment #} World")
+        assert len(res) == 1
+        assert res[0].text == "Hello World"
+        assert res[0].offset == 0
+
+    def test_fold(self):
+        res = nodes("a {{ 1 + 2 }} {{ 'x' * 2 }} b")
+        assert len(res) == 1
+        assert res[0].text == "a 3 xx b"
+
+    def test_no_fold(self):
+        res = nodes("{{ a + 1 }}")
+        assert isinstance(res[0], ExpressionNode)
+
+    def test_no_fold_error(self):
+        """ errors are still raised while rendering """
+        tpl = Template("{{ 1 / 0 }}")
+        assert isinstance(tpl.mainnode.nodes[0], ExpressionNode)
+        with pytest.raises(ZeroDivisionError):
+            tpl.render()
+
+    def test_constant_if(self):
+        res = nodes("a{% if 1 %}b{% else %}c{% endif %}d")
+        assert len(res) == 1
+        assert res[0].text == "abd"
+
+    def test_constant_else(self):
+        assert nodes("{% if 0 %}b{% elif '' %}c{% else %}d{% endif %}"
+                     )[0].text == "d"
+
+    def test_constant_false(self):
+        assert nodes("a{% if 0 %}b{% endif %}")[0].text == "a"
+
+    def test_constant_elif(self):
+        tpl = Template("{% if x %}a{% elif 0 %}b{% elif 1 %}c"
+                       "{% else %}d{% endif %}")
+        node = tpl.mainnode.nodes[0]
+        assert isinstance(node, IfBlockStatementNode)
+        assert len(node.branches) == 1
+        assert node.orelse[0].text == "c"
+        assert tpl.render(x=1) == "a"
+        assert tpl.render(x=0) == "c"
+
+    def test_nested(self):
+        tpl = Template("{% for i in j %}[{{ 2 * 2 }}{# x #}]{{i}}"
+                       "{% endfor %}")
+        for_node = tpl.mainnode.nodes[0]
+        assert for_node.nodes[0].text == "[4]"
+        assert tpl.render(j=[1, 2]) == "[4]1[4]2"
+
+    def test_fills(self):
+        base = Template("HEAD {%slot a%}{%endslot%} FOOTER")
+        child = Template("{%fill a%}{{ 1 }}{# x #}!{%endfill%}",
+                         parent=base)
+        fill = child.mainnode.fills["a"]
+        assert fill.nodes[0].text == "1!"
+        assert child.render() == "HEAD 1! FOOTER"
+
+    def test_disabled(self):
+        tpl = Template("a{# b #}c", optimize=False)
+        assert len(tpl.mainnode.nodes) == 3
+        assert tpl.render() == "ac"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_same_output(self, codegen):
+        code = ("{% for i in j %}{% if 1 > 2 %}never{% elif i %}{{i}}"
+                "{% else %}{{ 'zero' }}{% endif %}{# c #}, {% endfor %}")
+        expected = Template(code, optimize=False).render(j=[0, 1])
+        assert Template(code, codegen=codegen).render(j=[0, 1]) == expected
+
+    def test_optimize(self):
+        node = Template("a{# b #}c", optimize=False).mainnode
+        assert optimize(node, Context) is node
+        assert len(node.nodes) == 1
+        assert isinstance(node.nodes[0], TextNode)
+
+
+class TestOtherEvaluators:
+    """ literals are only evaluated while compiling for contexts that
+        evaluate them like Context """
+
+    def test_context_class(self):
+        tpl = Template("{{ 1 + 2 }}", context_class=ConcatContext)
+        assert isinstance(tpl.mainnode.nodes[0], ExpressionNode)
+        assert tpl.render() == "1+2"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_render_with(self, codegen):
+        tpl = Template("{{ 1 + 2 }}", codegen=codegen)
+        assert tpl.render() == "3"
+        assert tpl.render(context_class=ConcatContext) == "1+2"
+        assert tpl.render(context=ConcatContext()) == "1+2"
+        assert tpl.render() == "3"
+
+    def test_parents(self):
+        base = Template("[{{ 1 + 2 }}{% slot %}{% endslot %}]")
+        child = Template("{{ 3 + 4 }}", parent=base)
+        assert child.render() == "[37]"
+        assert child.render(context_class=ConcatContext) == "[1+23+4]"
+
+    def test_compile_options(self):
+        assert Template("").compile_options() == ()
+        assert Template("", optimize=False).compile_options() == \
+            ("no_optimize",)
+        assert Template("", context_class=ConcatContext).compile_options() \
+            == ("context_class={}.ConcatContext".format(__name__),)
+
+    def test_compile_cache(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        assert Template("{{ 1 + 2 }}", compile_cache=cache).render() == "3"
+        tpl = Template("{{ 1 + 2 }}", compile_cache=cache,
+                       context_class=ConcatContext)
+        assert tpl.render() == "1+2"
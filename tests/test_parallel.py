@@ -0,0 +1,61 @@
+import pickle
+
+import pytest
+
+from ate.ate import Template
+from ate.exceptions import EvaluationError
+from ate.loader import Loader
+from ate.parallel import render_many
+
+
+class TestPickle:
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_template(self, codegen):
+        tpl = Template("{%for i in j%}{{i}}{%if loop.last%}.{%endif%}"
+                       "{%endfor%}", codegen=codegen)
+        copy = pickle.loads(pickle.dumps(tpl))
+        assert copy.render(j=[1, 2, 3]) == "123."
+        assert bool(copy.generate_function) == codegen
+
+    def test_parent(self):
+        base = Template("HEAD {%slot%}xxx{%endslot%} FOOTER")
+        child = Template("body", parent=base)
+        copy = pickle.loads(pickle.dumps(child))
+        assert copy.render() == "HEAD body FOOTER"
+
+    def test_loader(self, tmp_path):
+        (tmp_path / "base.html").write_text("[{%slot%}{%endslot%}]")
+        (tmp_path / "page.html").write_text("page")
+        loader = Loader(str(tmp_path))
+        page = loader.load("page.html", parent="base.html")
+
+        copy = pickle.loads(pickle.dumps(page))
+        assert copy.loader is not loader
+        assert copy.render() == "[page]"
+
+    def test_evaluation_error(self):
+        tpl = Template("{{ 1 / i }}")
+        with pytest.raises(EvaluationError) as e:
+            tpl.render()
+        copy = pickle.loads(pickle.dumps(e.value))
+        assert str(copy) == str(e.value)
+        assert copy.expression.source == " 1 / i "
+
+
+class TestRenderMany:
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_order(self, codegen):
+        tpl = Template("Hello {{name}}", codegen=codegen)
+        contexts = ({"name": i} for i in range(50))
+        assert list(render_many(tpl, contexts, workers=2, chunksize=3)) \
+            == ["Hello {}".format(i) for i in range(50)]
+
+    def test_empty(self):
+        assert list(render_many(Template("x"), [], workers=2)) == []
+
+    def test_error(self):
+        tpl = Template("{{ 1 / i }}")
+        with pytest.raises(ZeroDivisionError):
+            list(render_many(tpl, [{"i": 1}, {"i": 0}], workers=1))
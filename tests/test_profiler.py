@@ -0,0 +1,109 @@
+import pytest
+
+from ate.ate import Template, Context
+from ate.profiler import Profiler
+from ate.tags import Node, ForBlockStatementNode
+
+
+CODE = ("Hello\n"
+        "{% for i in j %}{{ i * 2 }}{% if i > 1 %}big{% endif %}"
+        "{% endfor %}")
+
+
+class TestProfiler:
+
+    def test_disabled(self):
+        """ nothing is replaced unless the profiler is enabled """
+        generate = ForBlockStatementNode.generate
+        evaluate = Context.eval
+        with Profiler():
+            assert ForBlockStatementNode.generate is not generate
+            assert Context.eval is not evaluate
+        assert ForBlockStatementNode.generate is generate
+        assert Context.eval is evaluate
+
+    def test_nodes(self):
+        tpl = Template(CODE)
+        with Profiler() as profiler:
+            assert tpl.render(j=[1, 2, 3]) == "Hello\n24big6big"
+
+        nodes = {entry.tag: entry for entry in profiler.results("node")}
+        assert nodes["for"].calls == 1
+        assert nodes["for"].position == (2, 1)
+        assert nodes["expression"].calls == 3
+        assert nodes["if"].calls == 3
+        assert nodes["main"].calls == 1
+        assert nodes["main"].total >= nodes["for"].total >= \
+            nodes["for"].own
+
+    def test_evals(self):
+        tpl = Template(CODE)
+        with Profiler() as profiler:
+            tpl.render(j=[1, 2, 3])
+
+        evals = {entry.source: entry for entry in profiler.results("eval")}
+        assert evals["j"].calls == 1
+        assert evals["i * 2"].calls == 3
+        assert evals["i > 1"].calls == 3
+        assert evals["i * 2"].position == (2, 17)
+
+    def test_subclassed_context(self):
+        """ an eval() calling super().eval() is counted once """
+        class DelegatingContext(Context):
+            def eval(self, expr, strict=False):
+                return super().eval(expr, strict)
+
+        tpl = Template("{% for i in j %}{{ i }}{% endfor %}",
+                       context_class=DelegatingContext)
+        with Profiler() as profiler:
+            tpl.render(j=[1, 2, 3])
+        evals = {entry.source: entry for entry in profiler.results("eval")}
+        assert evals["i"].calls == 3
+        assert evals["j"].calls == 1
+
+    def test_render_nested(self):
+        tpl = Template("{% for i in j %}{{ i }}{% endfor %}")
+        with Profiler() as profiler:
+            tpl.render_nested(j=[1, 2])
+        nodes = {entry.tag: entry for entry in profiler.results("node")}
+        assert nodes["expression"].calls == 2
+
+    def test_no_double_count(self):
+        """ Node.generate calling render is counted once """
+        class Custom(Node):
+            def render(self, context):
+                return "x"
+
+        node = Custom()
+        with Profiler() as profiler:
+            assert list(node.generate(Context())) == ["x"]
+        assert profiler.results()[0].calls == 1
+
+    def test_callback(self):
+        exported = []
+        tpl = Template("{{ a }}")
+        with Profiler(callback=exported.append):
+            tpl.render(a=1)
+        assert len(exported) == 1
+        assert {entry["kind"] for entry in exported[0]} == {"node", "eval"}
+
+    def test_report(self):
+        tpl = Template(CODE)
+        with Profiler() as profiler:
+            tpl.render(j=[1, 2])
+        report = profiler.report(top=2)
+        assert "Nodes (top 2 by total time)" in report
+        assert "Expressions" in report
+        assert len(report.splitlines()) == 2 * (2 + 2) + 1
+
+    def test_one_at_a_time(self):
+        with Profiler():
+            with pytest.raises(RuntimeError):
+                Profiler().enable()
+
+    def test_error(self):
+        tpl = Template("{% for i in j %}{{ 1 / i }}{% endfor %}")
+        with Profiler() as profiler:
+            with pytest.raises(ZeroDivisionError):
+                tpl.render(j=[1, 0])
+            assert profiler.stack() == []
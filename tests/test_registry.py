@@ -1,8 +1,11 @@
 import pytest
 
+from ate.ate import Template, ParseContext
 from ate.registry import Registry
 from ate.exceptions import StatementNotFound, StatementNotAllowed
-from ate.tags import MainNode, StatementNode
+from ate.exceptions import UnexpectedClosingFound, ParseError
+from ate.tags import MainNode, StatementNode, BlockStatementNode
+from ate.tags import ForBlockStatementNode
 
 
 @pytest.fixture
@@ -199,3 +202,52 @@ class TestTagRegistry:
 
         assert registry.find("else", ifnode) == IfElseStatementNode
         assert registry.find("else", fornode) == ForElseStatementNode
+
+    def test_unexpected_closing(self, registry):
+        class BarStatementNode(BlockStatementNode):
+            closing = "endbar"
+
+        registry.register("bar", BarStatementNode, MainNode)
+        with pytest.raises(UnexpectedClosingFound):
+            registry.find("endbar", MainNode("main"))
+
+    def test_open_classes(self, registry):
+        """
+            The classes of all open blocks can be passed instead of
+            walking the node's parents
+        """
+        class FooStatementNode(StatementNode):
+            pass
+
+        class BarStatementNode(StatementNode):
+            pass
+
+        registry.register("foo", FooStatementNode, BarStatementNode)
+        # no parent relation, only the open classes are considered
+        m = MainNode("main")
+        assert registry.find(
+            "foo", m, {MainNode: 1, BarStatementNode: 1}) == FooStatementNode
+        with pytest.raises(StatementNotAllowed):
+            registry.find("foo", m, {MainNode: 1})
+
+
+class TestParseStack:
+
+    def test_nested(self):
+        tpl = Template("{% if a %}{% for i in b %}{% endfor %}{% endif %}")
+        assert isinstance(tpl.mainnode.nodes[0].nodes[0],
+                          ForBlockStatementNode)
+
+    def test_direct(self):
+        """ else must appear directly in if, an open if further up doesn't
+            count """
+        with pytest.raises(ParseError) as e:
+            Template("{% if a %}{% for i in b %}{% else %}"
+                     "{% endfor %}{% endif %}")
+        assert e.value.pc.tag == "else"
+
+    def test_stack_empty(self):
+        pc = ParseContext("{% if a %}{% for i in b %}{% endfor %}{% endif %}")
+        MainNode("main").compile(pc)
+        assert pc.blocks == []
+        assert pc.open_classes == {}
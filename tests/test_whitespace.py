@@ -0,0 +1,62 @@
+import pytest
+
+from ate.ate import Template
+
+
+class TestWhitespaceControl:
+
+    def test_statement(self):
+        tpl = Template("<ul>\n  {%- for i in j %}\n  <li>{{i}}</li>\n"
+                       "  {%- endfor %}\n</ul>")
+        assert tpl.render(j=[1, 2]) == \
+            "<ul>\n  <li>1</li>\n  <li>2</li>\n</ul>"
+
+    def test_expression(self):
+        tpl = Template("a \n {{- b -}} \n c")
+        assert tpl.render(b=1) == "a1c"
+
+    def test_comment(self):
+        assert Template("a {#- x -#} b").render() == "ab"
+
+    def test_negative_number(self):
+        assert Template("a {{-1}} b").render() == "a -1 b"
+
+    def test_closing(self):
+        tpl = Template("{% if x -%}\n  yes\n{%- endif -%}\n!")
+        assert tpl.render(x=True) == "yes!"
+        assert tpl.render(x=False) == "!"
+
+    def test_else(self):
+        tpl = Template("{% if x %} a {%- else -%} b {% endif %}")
+        assert tpl.render(x=True) == " a"
+        assert tpl.render(x=False) == "b "
+
+
+class TestTrimBlocks:
+
+    CODE = ("<ul>\n"
+            "  {% for i in j %}\n"
+            "  <li>{{i}}</li>\n"
+            "  {% endfor %}\n"
+            "</ul>\n")
+
+    def test_default(self):
+        assert Template(self.CODE).render(j=[1]) == \
+            "<ul>\n  \n  <li>1</li>\n  \n</ul>\n"
+
+    @pytest.mark.parametrize("codegen", [False, True])
+    def test_trim_blocks(self, codegen):
+        tpl = Template(self.CODE, trim_blocks=True, codegen=codegen)
+        assert tpl.render(j=[1, 2]) == \
+            "<ul>\n  <li>1</li>\n  <li>2</li>\n</ul>\n"
+
+    def test_expression_lines(self):
+        """ lines with expressions are kept """
+        tpl = Template("  {{ a }}\n", trim_blocks=True)
+        assert tpl.render(a=1) == "  1\n"
+
+    def test_inheritance(self):
+        base = Template("<body>\n  {% slot %}\n  {% endslot %}\n</body>",
+                        trim_blocks=True)
+        child = Template("content\n", parent=base)
+        assert child.render() == "<body>\ncontent\n</body>"